@@ -0,0 +1,54 @@
+import hmac
+from functools import wraps
+
+from flask import current_app, jsonify, request
+
+#----------------------------------------------------------------------------#
+# Access to the admin paths (bulk import and export).
+#
+# They need `Authorization: Bearer <ADMIN_TOKEN>`. Without ADMIN_TOKEN they
+# are closed, except in debug mode.
+#
+# Bodies a cross-site form can send (form fields, multipart uploads,
+# text/plain) also need a CSRF token (Flask-WTF), in a `csrf_token` field
+# or an X-CSRFToken header, like the site's own forms.
+#----------------------------------------------------------------------------#
+
+FORM_MIMETYPES = ('application/x-www-form-urlencoded', 'multipart/form-data', 'text/plain')
+
+
+def _bearer_token():
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' else None
+
+
+def _csrf_error():
+    from flask_wtf.csrf import validate_csrf
+    from wtforms import ValidationError
+
+    try:
+        validate_csrf(request.form.get('csrf_token') or request.headers.get('X-CSRFToken'))
+    except ValidationError as error:
+        return str(error)
+    return None
+
+
+def admin_required(view):
+    """Serve `view` only to requests carrying the admin token."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        expected = current_app.config.get('ADMIN_TOKEN')
+        if not expected:
+            if not current_app.debug:
+                return jsonify({"error": 'Admin paths are disabled: ADMIN_TOKEN is not set.'}), 403
+        else:
+            token = _bearer_token()
+            if token is None or not hmac.compare_digest(token.encode(), expected.encode()):
+                return jsonify({"error": 'A valid admin token is required.'}), 401, {"WWW-Authenticate": 'Bearer'}
+
+        if request.method not in ('GET', 'HEAD') and request.mimetype in FORM_MIMETYPES:
+            error = _csrf_error()
+            if error is not None:
+                return jsonify({"error": error}), 400
+        return view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,183 @@
+import threading
+import time
+
+import click
+from flask import current_app, has_app_context, has_request_context
+from flask.cli import AppGroup
+from sqlalchemy import DDL, event, text
+
+from db import db
+from models import Venue, Show, GenreArray
+from cache import cache
+from routing import RoutingSession
+
+#----------------------------------------------------------------------------#
+# Area directory.
+#
+# /venues reads `area_directory`, one row per venue with its area, name,
+# genres and upcoming show count (the venue's upcoming_shows_count, see
+# counters.py), through a single index in directory order. On Postgres it is a materialized view refreshed CONCURRENTLY, so
+# reads are never blocked; on SQLite it is a summary table rebuilt in one
+# transaction, which readers see either entirely before or after.
+#
+# It is refreshed after a commit that wrote venues or shows, a bulk import
+# and a counter rollover or recount, so it shows the same counts as search
+# and the venue pages: in a background thread at most every
+# AREA_DIRECTORY_REFRESH_INTERVAL seconds, or inline with
+# AREA_DIRECTORY_REFRESH=sync and outside requests (`flask import-catalog`,
+# `flask show-counters rollover`). `flask area-directory refresh` rebuilds
+# it by hand.
+#
+# Every refresh bumps the 'areas' cache namespace.
+#----------------------------------------------------------------------------#
+
+AREA_DIRECTORY = 'area_directory'
+
+area_directory = db.table(
+    AREA_DIRECTORY,
+    db.column('id', db.Integer),
+    db.column('city', db.String(120)),
+    db.column('state', db.String(120)),
+    db.column('name', db.String),
+    db.column('genres', GenreArray),
+    db.column('num_upcoming_shows', db.Integer),
+)
+
+AREA_DIRECTORY_KEY = [area_directory.c.city, area_directory.c.state, area_directory.c.name, area_directory.c.id]
+
+
+SELECT = '''
+    SELECT v.id, v.city, v.state, v.name, v.genres, v.upcoming_shows_count AS num_upcoming_shows
+    FROM "Venue" v
+'''
+
+
+def _indexes():
+    return [
+        f'CREATE UNIQUE INDEX IF NOT EXISTS ix_{AREA_DIRECTORY}_id ON {AREA_DIRECTORY} (id)',
+        f'CREATE INDEX IF NOT EXISTS ix_{AREA_DIRECTORY}_area ON {AREA_DIRECTORY} (city, state, name, id)',
+    ]
+
+
+POSTGRES_DDL = [
+    f'CREATE MATERIALIZED VIEW IF NOT EXISTS {AREA_DIRECTORY} AS {SELECT} WITH DATA',
+    *_indexes(),
+    f'CREATE INDEX IF NOT EXISTS ix_{AREA_DIRECTORY}_genres ON {AREA_DIRECTORY} USING gin (genres)',
+]
+
+SQLITE_DDL = [
+    f'CREATE TABLE IF NOT EXISTS {AREA_DIRECTORY} (id INTEGER PRIMARY KEY, city VARCHAR(120), '
+    f'state VARCHAR(120), name VARCHAR, genres JSON, num_upcoming_shows INTEGER NOT NULL)',
+    *_indexes(),
+]
+
+for _statement in POSTGRES_DDL:
+    event.listen(db.metadata, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in SQLITE_DDL:
+    event.listen(db.metadata, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(db.metadata, 'before_drop',
+             DDL(f'DROP MATERIALIZED VIEW IF EXISTS {AREA_DIRECTORY}').execute_if(dialect='postgresql'))
+event.listen(db.metadata, 'before_drop', DDL(f'DROP TABLE IF EXISTS {AREA_DIRECTORY}').execute_if(dialect='sqlite'))
+
+
+def refresh():
+    """Rebuild the directory on the primary, then bump the 'areas' namespace."""
+    with db.engine.begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {AREA_DIRECTORY}'))
+        else:
+            connection.execute(text(f'DELETE FROM {AREA_DIRECTORY}'))
+            connection.execute(text(f'INSERT INTO {AREA_DIRECTORY} {SELECT}'))
+    cache.bump('areas')
+
+
+class Refresher:
+    """Coalesces refresh requests into at most one refresh per interval."""
+
+    def __init__(self):
+        self._wanted = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def request(self):
+        if not has_app_context():
+            return
+        app = current_app._get_current_object()
+        mode = app.config['AREA_DIRECTORY_REFRESH']
+        # Outside a request (CLI commands, scripts) the process may exit
+        # before a daemon thread gets to run.
+        if mode == 'sync' or (mode == 'background' and not has_request_context()):
+            refresh()
+        elif mode == 'background':
+            self._wanted.set()
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, args=(app,), name='area-directory', daemon=True)
+                    self._thread.start()
+
+    def _run(self, app):
+        while True:
+            self._wanted.wait()
+            self._wanted.clear()
+            with app.app_context():
+                try:
+                    refresh()
+                except Exception:
+                    app.logger.exception('area directory refresh failed')
+            time.sleep(app.config['AREA_DIRECTORY_REFRESH_INTERVAL'])
+
+
+refresher = Refresher()
+request_refresh = refresher.request
+
+
+#----------------------------------------------------------------------------#
+# Writes that make the directory stale.
+#----------------------------------------------------------------------------#
+
+STALE = 'area_directory_stale'
+
+
+def _touches_directory(objects):
+    return any(isinstance(obj, (Venue, Show)) for obj in objects)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _note_write(session, flush_context):
+    if _touches_directory(session.new) or _touches_directory(session.dirty) or _touches_directory(session.deleted):
+        session.info[STALE] = True
+
+
+@event.listens_for(RoutingSession, 'after_bulk_update')
+@event.listens_for(RoutingSession, 'after_bulk_delete')
+def _note_bulk_write(context):
+    if context.mapper.class_ in (Venue, Show):
+        context.session.info[STALE] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _refresh_after_commit(session):
+    if session.info.pop(STALE, False):
+        request_refresh()
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop(STALE, None)
+
+
+area_directory_cli = AppGroup('area-directory', help='Maintain the /venues area directory.')
+
+
+@area_directory_cli.command('refresh')
+def refresh_command():
+    """Rebuild the area directory now."""
+    started = time.perf_counter()
+    refresh()
+    click.echo(f'area directory refreshed in {time.perf_counter() - started:.2f}s')
+
+
+def init_app(app):
+    app.config.setdefault('AREA_DIRECTORY_REFRESH', 'background')
+    app.config.setdefault('AREA_DIRECTORY_REFRESH_INTERVAL', 5)
+    app.cli.add_command(area_directory_cli)
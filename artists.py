@@ -0,0 +1,143 @@
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from db import db
+from models import Artist
+from loaders import artist_detail, artist_listing, stream_artists, artist_last_modified, artist_last_modified_async
+from streaming import wants_stream, stream_page
+from cache import cache
+from routing import use_replica
+from windows import requested_window, window_args
+from conditional import conditional
+from search import artist_search_page, artist_search_facets
+from genres import requested_genres, genre_args, listing_facets
+
+bp = Blueprint('artists', __name__)
+
+#  Artists
+#  ----------------------------------------------------------------
+
+@bp.route('/artists')
+@cache.cached('artists')
+@use_replica
+def artists():
+  genres, match = requested_genres()
+  filters = dict(
+    facets=listing_facets(Artist, genres, match),
+    genres=genres, match=match, genre_args=genre_args(genres, match),
+  )
+  if wants_stream():
+    return stream_page('pages/artists.html', artists=stream_artists(current_app.config['STREAM_BATCH_SIZE'], genres, match), page=None, **filters)
+
+  page = artist_listing(request.args.get('page'), current_app.config['PAGE_SIZE'], genres, match)
+  return render_template('pages/artists.html', artists=page.items, page=page, **filters)
+
+@bp.route('/artists/search', methods=['GET', 'POST'])
+@cache.cached('artists', 'shows')
+@use_replica
+def search_artists():
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+
+  search_term=request.values.get('search_term', '')
+  genres, match = requested_genres()
+  page=artist_search_page(search_term, request.args.get('page'), current_app.config['PAGE_SIZE'], genres, match)
+  facets=artist_search_facets(search_term, genres, match)
+
+  return render_template('pages/search_artists.html', results=page.items, search_term=search_term, page=page,
+    facets=facets, genres=genres, match=match, genre_args=genre_args(genres, match))
+
+@bp.route('/artists/<int:artist_id>')
+@use_replica
+@conditional(artist_last_modified, artist_last_modified_async)
+@cache.cached('venues', 'artists', 'shows')
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  start, end = requested_window()
+  data = artist_detail(artist_id, start=start, end=end)
+  if data is None:
+    abort(404)
+
+  return render_template('pages/show_artist.html', artist=data, start=start, end=end, window_args=window_args(start, end))
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+
+  artist = Artist.query.get_or_404(artist_id)
+  form = ArtistForm(obj=artist)
+
+  return render_template('forms/edit_artist.html', form=form, artist=artist)
+
+@bp.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  from forms import ArtistForm
+
+  artist = Artist.query.get_or_404(artist_id)
+  form = ArtistForm(request.form, meta={"csrf": False})
+
+  if form.validate():
+    try:
+
+      artist.name = form.name.data
+      artist.city = form.city.data
+      artist.state = form.state.data
+      artist.phone = form.phone.data
+      artist.image_link = form.image_link.data
+      artist.genres = form.genres.data
+      artist.facebook_link = form.facebook_link.data
+      artist.website_link = form.website_link.data
+      artist.seeking_description = form.seeking_description.data
+      artist.seeking_venue = bool(form.seeking_venue.data)
+
+      db.session.commit()
+      cache.bump('artists')
+      flash('Artist ' + artist.name + ' was successfully edited!')
+    except:
+      db.session.rollback()
+      flash('Artist ' + artist.name + ' could not be edited!')
+    finally:
+      db.session.close()
+  else:
+    flash('Errors in validation')
+
+  return redirect(url_for('.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@bp.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@bp.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  # called upon submitting the new artist listing form
+  try:
+    thisArtist = Artist(name=request.form.get('name'),
+        city=request.form.get('city'),
+        state=request.form.get('state'),
+        phone=request.form.get('phone'),
+        image_link=request.form.get('image_link'),
+        facebook_link=request.form.get('facebook_link'),
+        genres=request.form.getlist('genres'),
+        website_link=request.form.get('website_link'),
+        seeking_venue=request.form.get('seeking_venue', default=False, type=bool),
+        seeking_description=request.form.get('seeking_description'),
+        shows=request.form.getlist('shows')
+    )
+    db.session.add(thisArtist)
+    db.session.commit()
+    cache.bump('artists')
+    flash('Artist ' + request.form['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Artist ' + request.form.name + ' could not be listed.')
+  finally:
+    db.session.close()
+
+  return render_template('pages/home.html')
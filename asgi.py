@@ -0,0 +1,262 @@
+import asyncio
+import io
+import sys
+from urllib.parse import quote
+
+from flask import abort, current_app, g, request, render_template
+
+from app import create_app
+from models import Venue, Artist
+import conditional
+from cache import cache
+from routing import pick_replica
+from streaming import wants_stream
+from genres import requested_genres, genre_args, listing_facets_async
+from windows import requested_window, window_args
+from loaders import venue_directory_async, artist_listing_async, show_listing_async
+from loaders import venue_detail_async, artist_detail_async
+from search import venue_search_async, artist_search_async
+from async_db import adb
+
+#----------------------------------------------------------------------------#
+# ASGI serving mode.
+#
+#   uvicorn asgi:application --workers 4
+#
+# The read pages -- /venues, /artists, /shows, the venue and artist pages
+# and GET search -- are served by the async views below, which run their
+# queries on the async engines (async_db.py), concurrently where they are
+# independent. Everything else (forms, writes, exports, streamed listings,
+# POST search) is handed to the WSGI app unchanged, so both modes serve
+# the same site.
+#
+# The async views go through the same request context, page cache, replica
+# choice, conditional GET, templates, error handlers and after_request
+# hooks (ETags, compression) as the WSGI views they stand in for.
+#
+# Needs asgiref and uvicorn, plus asyncpg (Postgres) or aiosqlite (SQLite).
+#----------------------------------------------------------------------------#
+
+ASYNC_VIEWS = {}
+
+
+def async_view(endpoint, streamed=False):
+    """Serve `endpoint` with this coroutine.
+
+    The page is cached under the same namespaces as the WSGI view, and
+    answers conditional requests with its async validator (conditional.py).
+    Listings that can be `streamed` are left to WSGI when a stream is asked
+    for.
+    """
+    def decorator(view):
+        async def wrapper(**kwargs):
+            bind = pick_replica()
+            if bind is not None:
+                # Sync helpers (e.g. the SQLite genre index) follow the same replica.
+                g.db_replica = bind
+
+            wsgi_view = current_app.view_functions[endpoint]
+            _, validator = getattr(wsgi_view, 'validators', (None, None))
+            page_validators = None
+            if validator is not None and conditional.applies():
+                changed = await validator(bind, **kwargs)
+                if changed is not None:
+                    page_validators = conditional.validators(changed)
+                    if conditional.not_modified(*page_validators):
+                        return conditional.not_modified_response(*page_validators)
+
+            response = await _cached_or_rendered(view, bind, kwargs, getattr(wsgi_view, 'cache_namespaces', None))
+            if page_validators is not None and response.status_code == 200:
+                conditional.set_validators(response, *page_validators)
+            return response
+        ASYNC_VIEWS[endpoint] = wrapper, streamed
+        return view
+    return decorator
+
+
+async def _cached_or_rendered(view, bind, kwargs, namespaces):
+    key = cache.page_key(namespaces) if namespaces else None
+    if key is not None:
+        response = cache.cached_page(key)
+        if response is not None:
+            return response
+
+    response = current_app.make_response(await view(bind, **kwargs))
+    if key is not None:
+        cache.store_page(key, response, namespaces)
+    return response
+
+
+#----------------------------------------------------------------------------#
+# Views.
+#----------------------------------------------------------------------------#
+
+@async_view('venues.venues', streamed=True)
+async def venues(bind):
+    genres, match = requested_genres()
+    page, facets = await asyncio.gather(
+        venue_directory_async(request.args.get('page'), current_app.config['PAGE_SIZE'], genres, match, bind),
+        listing_facets_async(Venue, genres, match, bind),
+    )
+    return render_template('pages/venues.html', areas=page.items, page=page,
+                           facets=facets, genres=genres, match=match, genre_args=genre_args(genres, match))
+
+
+@async_view('artists.artists', streamed=True)
+async def artists(bind):
+    genres, match = requested_genres()
+    page, facets = await asyncio.gather(
+        artist_listing_async(request.args.get('page'), current_app.config['PAGE_SIZE'], genres, match, bind),
+        listing_facets_async(Artist, genres, match, bind),
+    )
+    return render_template('pages/artists.html', artists=page.items, page=page,
+                           facets=facets, genres=genres, match=match, genre_args=genre_args(genres, match))
+
+
+@async_view('shows.shows', streamed=True)
+async def shows(bind):
+    start, end = requested_window()
+    page = await show_listing_async(request.args.get('page'), current_app.config['PAGE_SIZE'], start, end, bind)
+    return render_template('pages/shows.html', shows=page.items, page=page,
+                           start=start, end=end, window_args=window_args(start, end))
+
+
+@async_view('venues.show_venue')
+async def show_venue(bind, venue_id):
+    start, end = requested_window()
+    data = await venue_detail_async(venue_id, start=start, end=end, bind=bind)
+    if data is None:
+        abort(404)
+    return render_template('pages/show_venue.html', venue=data,
+                           start=start, end=end, window_args=window_args(start, end))
+
+
+@async_view('artists.show_artist')
+async def show_artist(bind, artist_id):
+    start, end = requested_window()
+    data = await artist_detail_async(artist_id, start=start, end=end, bind=bind)
+    if data is None:
+        abort(404)
+    return render_template('pages/show_artist.html', artist=data,
+                           start=start, end=end, window_args=window_args(start, end))
+
+
+async def _search(bind, search, template):
+    search_term = request.values.get('search_term', '')
+    genres, match = requested_genres()
+    page, facets = await search(search_term, request.args.get('page'), current_app.config['PAGE_SIZE'], genres, match, bind)
+    return render_template(template, results=page.items, search_term=search_term, page=page,
+                           facets=facets, genres=genres, match=match, genre_args=genre_args(genres, match))
+
+
+@async_view('venues.search_venues')
+async def search_venues(bind):
+    return await _search(bind, venue_search_async, 'pages/search_venues.html')
+
+
+@async_view('artists.search_artists')
+async def search_artists(bind):
+    return await _search(bind, artist_search_async, 'pages/search_artists.html')
+
+
+#----------------------------------------------------------------------------#
+# ASGI application.
+#----------------------------------------------------------------------------#
+
+def _environ(scope):
+    """A WSGI environ for an ASGI http scope, enough for a request context."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    headers = {}
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        headers[name] = f'{headers[name]},{value}' if name in headers else value
+    return {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'RAW_URI': quote(scope['path']),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': False,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        **headers,
+    }
+
+
+async def _dispatch(view, view_args):
+    """Full request dispatch, as Flask's, around an async view."""
+    try:
+        response = current_app.preprocess_request()
+        if response is None:
+            response = await view(**view_args)
+    except Exception as error:
+        try:
+            response = current_app.handle_user_exception(error)
+        except Exception as error:
+            response = current_app.handle_exception(error)
+    return current_app.process_response(current_app.make_response(response))
+
+
+async def _send(send, response, head=False):
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in response.headers.items()],
+    })
+    await send({'type': 'http.response.body', 'body': b'' if head else response.get_data()})
+
+
+class Application:
+    def __init__(self, flask_app):
+        from asgiref.wsgi import WsgiToAsgi
+
+        self.app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+            if await self._serve(scope, send):
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _serve(self, scope, send):
+        """Serve the request with an async view; False if there is none."""
+        context = self.app.request_context(_environ(scope))
+        context.push()
+        try:
+            rule = request.url_rule
+            view, streamed = ASYNC_VIEWS.get(rule.endpoint if rule is not None else None, (None, False))
+            if view is None or (streamed and wants_stream()):
+                return False
+            response = await _dispatch(view, request.view_args)
+            await _send(send, response, head=scope['method'] == 'HEAD')
+            return True
+        finally:
+            context.pop()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                with self.app.app_context():
+                    await adb.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+application = Application(create_app())
@@ -0,0 +1,276 @@
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import tempfile
+import threading
+import time
+
+import click
+from flask import current_app, request, send_file
+from flask.cli import AppGroup, with_appcontext
+from werkzeug.exceptions import NotFound
+from werkzeug.security import safe_join
+
+#----------------------------------------------------------------------------#
+# Static asset bundles.
+#
+# The stylesheets and scripts every page loads are concatenated into a few
+# bundles, minified, named after a hash of their content and written with
+# gzip and brotli variants next to them:
+#
+#   flask assets build     # static/build/main.3f9c2a7e01d4.css, .css.gz, .css.br
+#
+# Templates link them with asset_url('main.css'). They are served from
+# /assets/<name> with the best encoding the client accepts and a far-future
+# immutable Cache-Control: a changed file gets a new name, so a cached one
+# never needs revalidating. Builds are deterministic and old files are kept,
+# so every worker builds the same names and pages cached before a deploy
+# still find their assets.
+#
+# Build at deploy time. Otherwise the first asset_url() builds the bundles,
+# and with ASSETS_AUTO_BUILD (the default in debug mode) they are rebuilt
+# whenever a source file changes.
+#
+# CSS is minified here; JavaScript is minified with `rjsmin` and brotli
+# variants need `brotli`. Without them, scripts are only concatenated and
+# only gzip variants are written.
+#----------------------------------------------------------------------------#
+
+# Bundle name -> source files in the static folder, in load order.
+BUNDLES = {
+    'main.css': [
+        'css/bootstrap.min.css',
+        'css/layout.main.css',
+        'css/main.css',
+        'css/main.responsive.css',
+        'css/main.quickfix.css',
+    ],
+    # Loaded in <head>, before the page renders.
+    'head.js': [
+        'js/libs/modernizr-2.8.2.min.js',
+        'js/libs/moment.min.js',
+    ],
+    # Deferred, after jQuery.
+    'main.js': [
+        'js/script.js',
+        'js/libs/bootstrap-3.1.1.min.js',
+        'js/plugins.js',
+    ],
+}
+
+MANIFEST = 'manifest.json'
+HASH_LENGTH = 12
+IMMUTABLE = 'public, max-age=31536000, immutable'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_CSS_TOKENS = re.compile(r'''("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*'|/\*.*?\*/)''', re.S)
+_CSS_URL = re.compile(r'''url\(\s*(['"]?)([^'")]+)\1\s*\)''')
+_URL_SCHEME = re.compile(r'[a-zA-Z][a-zA-Z0-9+.-]*:')
+
+
+def _minify_css_code(code):
+    code = re.sub(r'\s+', ' ', code)
+    # Not before ':' -- `a :hover` and `a:hover` are different selectors.
+    code = re.sub(r' ?([{};,>]) ?', r'\1', code)
+    return code.replace(': ', ':').replace(';}', '}')
+
+
+def minify_css(css):
+    """Drop comments (except /*! licenses */) and whitespace that CSS ignores."""
+    parts, code = [], []
+    for i, token in enumerate(_CSS_TOKENS.split(css)):
+        if not i % 2:
+            code.append(token)
+        elif not token.startswith('/*') or token.startswith('/*!'):
+            # Strings and license comments are kept as they are.
+            parts += [_minify_css_code(''.join(code)), token]
+            code = []
+    parts.append(_minify_css_code(''.join(code)))
+    return ''.join(parts).strip()
+
+
+def minify_js(js):
+    try:
+        import rjsmin
+    except ImportError:
+        return js
+    return rjsmin.jsmin(js, keep_bang_comments=True)
+
+
+def rebase_css_urls(css, source, static_url_path):
+    """Rewrite relative url()s in `source` (a static path) to absolute static URLs."""
+    base = posixpath.dirname(source)
+
+    def rebase(match):
+        quote, url = match.groups()
+        if url.startswith(('/', '#')) or _URL_SCHEME.match(url):
+            return match.group(0)
+        return f'url({quote}{static_url_path}/{posixpath.normpath(posixpath.join(base, url))}{quote})'
+
+    return _CSS_URL.sub(rebase, css)
+
+
+def bundle(static_folder, name, sources, static_url_path='/static'):
+    """The minified contents of one bundle, as bytes."""
+    chunks = []
+    for source in sources:
+        with open(os.path.join(static_folder, source), encoding='utf-8') as file:
+            text = file.read()
+        if name.endswith('.css'):
+            chunks.append(minify_css(rebase_css_urls(text, source, static_url_path)))
+        else:
+            # Sources may rely on automatic semicolon insertion at their end.
+            chunks.append(minify_js(text).rstrip() + '\n;')
+    return '\n'.join(chunks).encode('utf-8')
+
+
+def fingerprinted(name, content):
+    stem, extension = posixpath.splitext(name)
+    return f'{stem}.{hashlib.sha256(content).hexdigest()[:HASH_LENGTH]}{extension}'
+
+
+def _write(path, data):
+    # Atomically, so a worker never serves a half-written file from another.
+    directory = os.path.dirname(path)
+    descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    with os.fdopen(descriptor, 'wb') as file:
+        file.write(data)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def _compressed(content):
+    variants = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        return variants
+    variants['.br'] = brotli.compress(content, quality=11)
+    return variants
+
+
+def build(static_folder, build_dir, static_url_path='/static', bundles=BUNDLES):
+    """Write every bundle and its variants; return the manifest {name: file name}."""
+    os.makedirs(build_dir, exist_ok=True)
+    manifest = {}
+    for name, sources in bundles.items():
+        content = bundle(static_folder, name, sources, static_url_path)
+        filename = manifest[name] = fingerprinted(name, content)
+        path = os.path.join(build_dir, filename)
+        if os.path.exists(path):
+            continue
+        for suffix, data in _compressed(content).items():
+            # Only worth sending when it saves something.
+            if len(data) < len(content):
+                _write(path + suffix, data)
+        _write(path, content)
+    _write(os.path.join(build_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+class Assets:
+    def __init__(self):
+        self.manifest = None
+        self.built_at = 0.0
+        self._lock = threading.Lock()
+
+    def build_dir(self, app):
+        return app.config['ASSETS_BUILD_DIR'] or os.path.join(app.static_folder, 'build')
+
+    def build(self, app):
+        self.manifest = build(app.static_folder, self.build_dir(app), app.static_url_path)
+        self.built_at = time.time()
+        return self.manifest
+
+    def _load(self, app):
+        try:
+            path = os.path.join(self.build_dir(app), MANIFEST)
+            with open(path) as file:
+                manifest = json.load(file)
+            built_at = os.path.getmtime(path)
+        except (OSError, ValueError):
+            return None
+        if set(manifest) != set(BUNDLES):
+            return None
+        self.built_at = built_at
+        return manifest
+
+    def _stale(self, app):
+        sources = {source for sources in BUNDLES.values() for source in sources}
+        return any(os.path.getmtime(os.path.join(app.static_folder, source)) > self.built_at for source in sources)
+
+    def current(self, app):
+        """The manifest, building it if there is none or (auto-build) it is stale."""
+        manifest = self.manifest
+        if manifest is not None and not (app.config['ASSETS_AUTO_BUILD'] and self._stale(app)):
+            return manifest
+        with self._lock:
+            if self.manifest is None:
+                self.manifest = self._load(app)
+            if self.manifest is None or (app.config['ASSETS_AUTO_BUILD'] and self._stale(app)):
+                if not app.config['ASSETS_AUTO_BUILD']:
+                    app.logger.warning('assets: no build found, building now (run `flask assets build` on deploy)')
+                self.build(app)
+            return self.manifest
+
+    def url(self, name):
+        """URL of a bundle, for templates: asset_url('main.css')."""
+        app = current_app._get_current_object()
+        return f'{app.config["ASSETS_URL_PATH"]}/{self.current(app)[name]}'
+
+
+assets = Assets()
+
+
+def asset_view(filename):
+    """A fingerprinted bundle, precompressed when the client accepts it."""
+    app = current_app._get_current_object()
+    path = safe_join(assets.build_dir(app), filename)
+    if path is None or filename == MANIFEST or not os.path.isfile(path):
+        raise NotFound()
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in ENCODINGS:
+        if request.accept_encodings[candidate] and os.path.isfile(path + suffix):
+            encoding, path = candidate, path + suffix
+            break
+    response = send_file(path, mimetype=mimetype, conditional=True)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+assets_cli = AppGroup('assets', help='Build the static asset bundles.')
+
+
+@assets_cli.command('build')
+@with_appcontext
+def build_command():
+    """Bundle, minify, fingerprint and precompress the static assets."""
+    app = current_app._get_current_object()
+    started = time.perf_counter()
+    manifest = assets.build(app)
+    build_dir = assets.build_dir(app)
+    for name, filename in sorted(manifest.items()):
+        path = os.path.join(build_dir, filename)
+        sizes = [f'{os.path.getsize(path)} B']
+        sizes += [f'{suffix[1:]} {os.path.getsize(path + suffix)} B'
+                  for _, suffix in ENCODINGS if os.path.exists(path + suffix)]
+        click.echo(f'{name:<10} {filename:<26} {", ".join(sizes)}')
+    click.echo(f'built in {time.perf_counter() - started:.2f}s into {build_dir}')
+
+
+def init_app(app):
+    app.config.setdefault('ASSETS_BUILD_DIR', None)
+    app.config.setdefault('ASSETS_URL_PATH', '/assets')
+    app.config.setdefault('ASSETS_AUTO_BUILD', app.debug)
+    app.add_url_rule(f'{app.config["ASSETS_URL_PATH"]}/<path:filename>', 'asset', asset_view)
+    app.jinja_env.globals['asset_url'] = assets.url
+    app.cli.add_command(assets_cli)
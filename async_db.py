@@ -0,0 +1,72 @@
+import shlex
+
+from flask import current_app
+from sqlalchemy.engine import make_url
+
+#----------------------------------------------------------------------------#
+# Async engines for the ASGI read path (see asgi.py).
+#
+# The primary and every replica bind get an AsyncEngine with the same pool
+# settings as their sync engine, on the async driver for the dialect
+# (asyncpg for Postgres, aiosqlite for SQLite). Queries are still built
+# with the models and db.session.query(); only their execution is async.
+#----------------------------------------------------------------------------#
+
+ASYNC_DRIVERS = {
+    'postgresql': 'postgresql+asyncpg',
+    'sqlite': 'sqlite+aiosqlite',
+}
+
+
+def async_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def async_engine_options(options):
+    """SQLALCHEMY_ENGINE_OPTIONS with libpq `-c name=value` options turned
+    into asyncpg server_settings, and the pool class swapped for its
+    asyncio variant."""
+    options = dict(options)
+    if 'poolclass' in options:
+        options['poolclass'] = getattr(options['poolclass'], 'asyncio_variant', options['poolclass'])
+    libpq_options = options.pop('connect_args', {}).get('options', '')
+    settings = dict(
+        setting.split('=', 1) for flag, setting in zip(*[iter(shlex.split(libpq_options))] * 2) if flag == '-c'
+    )
+    if settings:
+        options['connect_args'] = {"server_settings": settings}
+    return options
+
+
+class AsyncDatabase:
+    """Lazily created async engines, keyed by bind (None is the primary)."""
+
+    def __init__(self):
+        self._engines = {}
+
+    def engine(self, bind=None):
+        engine = self._engines.get(bind)
+        if engine is None:
+            from sqlalchemy.ext.asyncio import create_async_engine
+
+            config = current_app.config
+            url = config['SQLALCHEMY_BINDS'][bind] if bind else config['SQLALCHEMY_DATABASE_URI']
+            options = config['SQLALCHEMY_ENGINE_OPTIONS'] if url.startswith('postgres') else {}
+            engine = self._engines[bind] = create_async_engine(async_url(url), **async_engine_options(options))
+        return engine
+
+    async def fetch(self, query, bind=None):
+        """All rows of a Query (or Core statement), on its own connection."""
+        statement = getattr(query, 'statement', query)
+        async with self.engine(bind).connect() as connection:
+            result = await connection.execute(statement)
+            return result.all()
+
+    async def dispose(self):
+        engines, self._engines = list(self._engines.values()), {}
+        for engine in engines:
+            await engine.dispose()
+
+
+adb = AsyncDatabase()
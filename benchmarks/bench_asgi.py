@@ -0,0 +1,132 @@
+"""Requests/s and latency of the read pages, WSGI (gunicorn) vs ASGI (uvicorn).
+
+Both servers run the same number of worker processes against the same
+database, with the page cache off so every request reaches it. Point
+DATABASE_URL at a scratch database (it is dropped and re-seeded):
+
+    DATABASE_URL=postgresql://localhost/fyyur_bench python -m benchmarks.bench_asgi --workers 4
+
+Needs gunicorn, uvicorn and asgiref, plus asyncpg or aiosqlite.
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import app, reset_database
+from benchmarks.datagen import generate
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PATHS = [
+    '/venues',
+    '/artists',
+    '/shows',
+    '/venues/{venue}',
+    '/artists/{artist}',
+    '/venues/search?search_term=the',
+    '/artists/search?search_term=the',
+]
+
+SERVERS = {
+    "wsgi": lambda port, workers: [
+        'gunicorn', '--workers', str(workers), '--bind', f'127.0.0.1:{port}', '--log-level', 'warning', 'wsgi:app',
+    ],
+    "asgi": lambda port, workers: [
+        'uvicorn', '--workers', str(workers), '--port', str(port), '--log-level', 'warning', 'asgi:application',
+    ],
+}
+
+
+async def get(port, path):
+    """One GET on a fresh connection; the status code."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\n\r\n'.encode())
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    return int(response.split(b' ', 2)[1])
+
+
+async def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return await get(port, '/')
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+async def load(port, paths, concurrency, duration):
+    """(latencies in seconds, error count) from `concurrency` clients for `duration`."""
+    latencies = []
+    errors = 0
+    deadline = time.monotonic() + duration
+
+    async def client(offset):
+        nonlocal errors
+        i = offset
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status = await get(port, paths[i % len(paths)])
+            except OSError:
+                status = None
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+            i += 1
+
+    await asyncio.gather(*(client(offset) for offset in range(concurrency)))
+    return latencies, errors
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run(mode, port, workers, paths, concurrency, duration):
+    env = dict(os.environ, CACHE_ENABLED='0', WEB_CONCURRENCY=str(workers), PYTHONPATH=ROOT)
+    bin_dir = os.path.dirname(sys.executable)
+    command = SERVERS[mode](port, workers)
+    command[0] = os.path.join(bin_dir, command[0])
+    server = subprocess.Popen(command, cwd=ROOT, env=env)
+    try:
+        asyncio.run(wait_until_up(port))
+        asyncio.run(load(port, paths, concurrency, 1))  # warm up pools and templates
+        latencies, errors = asyncio.run(load(port, paths, concurrency, duration))
+    finally:
+        server.terminate()
+        server.wait()
+    return len(latencies) / duration, percentile(latencies, 0.5), percentile(latencies, 0.99), errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[8, 32])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--size', type=int, default=10000, help='shows to seed')
+    parser.add_argument('--port', type=int, default=8311)
+    args = parser.parse_args()
+
+    with app.app_context():
+        reset_database()
+        generate(venues=max(args.size // 10, 1), artists=max(args.size // 10, 1), shows=args.size)
+    paths = [path.format(venue=1 + i, artist=2 + i) for i, path in enumerate(PATHS)]
+
+    print(f'{"mode":<6} {"workers":>7} {"clients":>7} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8} {"errors":>6}')
+    for concurrency in args.concurrency:
+        for mode in SERVERS:
+            rps, p50, p99, errors = run(mode, args.port, args.workers, paths, concurrency, args.duration)
+            print(f'{mode:<6} {args.workers:>7} {concurrency:>7} {rps:>8.0f} '
+                  f'{p50 * 1000:>8.1f} {p99 * 1000:>8.1f} {errors:>6}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+"""Micro-benchmark of show-time formatting: old `datetime` filter vs formatting.
+
+Needs no database:
+
+    python -m benchmarks.bench_datetime_filter --rows 100000
+"""
+import argparse
+import time
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from formatting import format_datetime, format_datetimes
+
+
+def legacy_format_datetime(value, format='medium'):
+    # The filter as it was in app.py, fed str(show.start_time) by the handlers.
+    date = dateutil.parser.parse(value)
+    if format == 'full':
+        format = "EEEE MMMM, d, y 'at' h:mma"
+    elif format == 'medium':
+        format = "EE MM, dd, y h:mma"
+    return babel.dates.format_datetime(date, format, locale='en')
+
+
+def timed(label, func, rows):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<32} {elapsed * 1000:>9.1f} ms {rows / elapsed:>12,.0f} rows/s')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--format', default='full')
+    args = parser.parse_args()
+
+    start = datetime(2021, 5, 1, 20, 0)
+    values = [start + timedelta(minutes=37 * i) for i in range(args.rows)]
+
+    legacy = timed('legacy filter (str + dateutil)', lambda: [legacy_format_datetime(str(value), args.format) for value in values], args.rows)
+    single = timed('format_datetime per row', lambda: [format_datetime(value, args.format) for value in values], args.rows)
+    batch = timed('format_datetimes batch', lambda: format_datetimes(values, args.format), args.rows)
+    assert legacy == single == batch
+
+
+if __name__ == '__main__':
+    main()
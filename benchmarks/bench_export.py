@@ -0,0 +1,45 @@
+"""Throughput and peak memory of the streamed catalog export.
+
+Point DATABASE_URL at a scratch database (it is dropped and re-seeded):
+
+    DATABASE_URL=sqlite:////tmp/fyyur-bench.db python -m benchmarks.bench_export
+"""
+import argparse
+import tracemalloc
+
+from benchmarks.common import app, reset_database, seed
+from exporter import export_rows
+
+
+def measure(kind, format, batch_size):
+    """(rows, seconds, peak traced bytes, output bytes) for one export."""
+    stats = {}
+    size = 0
+    tracemalloc.start()
+    for chunk in export_rows(kind, format, batch_size=batch_size, stats=stats):
+        size += len(chunk)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return stats['rows'], stats['seconds'], peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f'{"shows":>8} {"export":<14} {"rows/s":>10} {"peak KiB":>9} {"out KiB":>9}')
+    with app.app_context():
+        for size in args.sizes:
+            reset_database()
+            seed(venues=max(size // 10, 1), artists=max(size // 10, 1), shows=size)
+            for kind in ('shows', 'venues'):
+                for format in ('csv', 'ndjson'):
+                    rows, seconds, peak, out = measure(kind, format, args.batch_size)
+                    print(f'{size:>8} {kind + "." + format:<14} {rows / seconds:>10,.0f} '
+                          f'{peak / 1024:>9.0f} {out / 1024:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
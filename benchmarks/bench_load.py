@@ -0,0 +1,308 @@
+"""Throughput and p50/p95/p99 latency of every route, against a saved baseline.
+
+Seeds a synthetic catalog (benchmarks/datagen.py) into DATABASE_URL, which
+is dropped first, then drives each route with --concurrency clients:
+
+    DATABASE_URL=postgresql://localhost/fyyur_bench python -m benchmarks.bench_load \\
+        --venues 10000 --artists 50000 --shows 1000000 --save-baseline baseline.json
+    DATABASE_URL=... python -m benchmarks.bench_load ... --baseline baseline.json
+
+Requests go through the Flask test client in this process, or to a running
+server with --url (seed it with --no-reset against the server's database
+beforehand, or let this script seed the same DATABASE_URL; set the
+server's ADMIN_TOKEN for the import and export routes). The page cache
+is off unless --cache is given, so reads reach the database.
+
+With --baseline, a route whose p95 or p99 is more than --tolerance slower
+than the baseline (and by more than 1 ms) is reported as a regression and
+the script exits with status 1. Every route in the app must have a scenario
+below; a new route without one fails the run.
+"""
+import argparse
+import json
+import platform
+import secrets
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from benchmarks.common import app, reset_database
+from benchmarks.datagen import generate
+from assets import assets
+from cache import cache
+from db import db
+from models import Venue, Artist
+
+# endpoint -> [(method, path, form data)]. Paths are formatted with
+# {venue} / {artist} (existing ids), {n} (the iteration), {new_venue}
+# (a venue created by create_venue_submission), {today}, {tomorrow} and
+# {main_css} (the built CSS bundle).
+SCENARIOS = {
+    "index": [('GET', '/', None)],
+    "static": [('GET', '/static/css/main.css', None)],
+    "asset": [('GET', '/assets/{main_css}', None)],
+    "venues.venues": [('GET', '/venues', None), ('GET', '/venues?genre=Jazz&genre=Blues', None)],
+    "artists.artists": [('GET', '/artists', None), ('GET', '/artists?genre=Pop&match=all', None)],
+    "shows.shows": [('GET', '/shows', None), ('GET', '/shows?from={today}&to={next_week}', None)],
+    "shows.calendar": [('GET', '/shows/calendar', None), ('GET', '/shows/calendar?month={month}&venue_id={venue}', None)],
+    "venues.show_venue": [('GET', '/venues/{venue}', None), ('GET', '/venues/{venue}?from={month}-01', None)],
+    "artists.show_artist": [('GET', '/artists/{artist}', None), ('GET', '/artists/{artist}?to={today}', None)],
+    "venues.search_venues": [
+        ('GET', '/venues/search?search_term=the', None),
+        ('POST', '/venues/search', {"search_term": 'owl'}),
+    ],
+    "artists.search_artists": [
+        ('GET', '/artists/search?search_term=the', None),
+        ('POST', '/artists/search', {"search_term": 'king'}),
+    ],
+    "venues.create_venue_form": [('GET', '/venues/create', None)],
+    "artists.create_artist_form": [('GET', '/artists/create', None)],
+    "shows.create_shows": [('GET', '/shows/create', None)],
+    "venues.edit_venue": [('GET', '/venues/{venue}/edit', None)],
+    "artists.edit_artist": [('GET', '/artists/{artist}/edit', None)],
+    "venues.create_venue_submission": [('POST', '/venues/create', {
+        "name": 'Load Venue {n}', "city": 'Chicago', "state": 'IL', "address": '1 Load St', "phone": '312-555-0100',
+        "genres": 'Jazz', "facebook_link": 'https://www.facebook.com/loadvenue',
+    })],
+    "artists.create_artist_submission": [('POST', '/artists/create', {
+        "name": 'Load Artist {n}', "city": 'Chicago', "state": 'IL', "phone": '312-555-0101',
+        "genres": 'Blues', "facebook_link": 'https://www.facebook.com/loadartist',
+    })],
+    "shows.create_show_submission": [('POST', '/shows/create', {
+        "venue_id": '{venue}', "artist_id": '{artist}', "start_time": '{today} 21:00:00',
+    })],
+    "venues.edit_venue_submission": [('POST', '/venues/{venue}/edit', {
+        "name": 'Edited Venue {n}', "city": 'Austin', "state": 'TX', "address": '2 Edit Ave', "phone": '512-555-0102',
+        "genres": 'Folk', "facebook_link": 'https://www.facebook.com/editedvenue',
+    })],
+    "artists.edit_artist_submission": [('POST', '/artists/{artist}/edit', {
+        "name": 'Edited Artist {n}', "city": 'Austin', "state": 'TX', "phone": '512-555-0103',
+        "genres": 'Soul', "facebook_link": 'https://www.facebook.com/editedartist',
+    })],
+    "venues.delete_venue": [('DELETE', '/venues/{new_venue}', None)],
+    "export_catalog": [
+        ('GET', '/export/shows.csv?from={today}&to={tomorrow}', None),
+        ('GET', '/export/venues.ndjson?since={today}', None),
+    ],
+    "import_catalog": [('POST', '/import/artists?format=csv', 'name,city,state,genres,facebook_link\nImported {n},Boston,MA,Jazz,https://www.facebook.com/imported\n')],
+    "metrics": [('GET', '/metrics', None)],
+    "cache_stats": [('GET', '/cache/stats', None)],
+    "pool_stats": [('GET', '/db/pool', None)],
+}
+
+
+def check_coverage():
+    missing = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - set(SCENARIOS))
+    if missing:
+        raise SystemExit(f'no load scenario for: {", ".join(missing)}')
+
+
+def _fill(value, values):
+    if isinstance(value, dict):
+        return {key: _fill(item, values) for key, item in value.items()}
+    return value.format(**values) if isinstance(value, str) else value
+
+
+def auth_headers():
+    """The admin token (access.py) for the import and export paths."""
+    token = app.config.get('ADMIN_TOKEN')
+    return {"Authorization": f'Bearer {token}'} if token else {}
+
+
+def requests_for(endpoint, count, sizes):
+    """`count` concrete (method, path, data) requests for one endpoint."""
+    variants = SCENARIOS[endpoint]
+    today = datetime.now().date()
+    main_css = assets.current(app)['main.css']
+    for n in range(count):
+        values = {
+            "n": n,
+            # Spread over the catalog, the same ids on every run.
+            "venue": n * 7919 % sizes['venues'] + 1,
+            "artist": n * 7919 % sizes['artists'] + 1,
+            "new_venue": sizes['venues'] + n + 1,
+            "today": today.isoformat(),
+            "tomorrow": (today + timedelta(days=1)).isoformat(),
+            "next_week": (today + timedelta(days=7)).isoformat(),
+            "month": today.strftime('%Y-%m'),
+            "main_css": main_css,
+        }
+        method, path, data = variants[n % len(variants)]
+        yield method, _fill(path, values), _fill(data, values)
+
+
+class ClientTransport:
+    """Requests through the Flask test client; one client per thread."""
+
+    def __init__(self):
+        self.clients = {}
+
+    def __call__(self, method, path, data):
+        client = self.clients.setdefault(threading.get_ident(), app.test_client())
+        options = {"content_type": 'text/csv'} if isinstance(data, str) else {}
+        try:
+            response = client.open(path, method=method, data=data, headers=auth_headers(), **options)
+            response.get_data()
+        except Exception:
+            # In debug mode view errors propagate instead of becoming 500s.
+            return 500
+        return response.status_code
+
+
+class HTTPTransport:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def __call__(self, method, path, data):
+        body = None
+        headers = auth_headers()
+        if isinstance(data, str):
+            body, headers['Content-Type'] = data.encode(), 'text/csv'
+        elif data is not None:
+            body = urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        request = urllib.request.Request(self.base_url + path, data=body, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as error:
+            return error.code
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+def run_route(transport, endpoint, count, concurrency, sizes):
+    """{rps, p50, p95, p99, errors} for `count` requests to one endpoint."""
+    requests = list(requests_for(endpoint, count, sizes))
+
+    def timed(request):
+        started = time.perf_counter()
+        status = transport(*request)
+        return time.perf_counter() - started, status
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        results = list(pool.map(timed, requests))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    return {
+        "requests": count,
+        "rps": round(count / elapsed, 1),
+        "p50": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99": round(percentile(latencies, 0.99) * 1000, 2),
+        "errors": sum(1 for _, status in results if status >= 400),
+    }
+
+
+def _revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """[(endpoint, metric, baseline ms, current ms)] for every regression."""
+    regressions = []
+    for endpoint, current in results.items():
+        before = baseline['routes'].get(endpoint)
+        if before is None:
+            continue
+        for metric in ('p95', 'p99'):
+            if current[metric] > before[metric] * (1 + tolerance) and current[metric] - before[metric] > 1:
+                regressions.append((endpoint, metric, before[metric], current[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-reset', action='store_true', help='reuse the catalog already in DATABASE_URL')
+    parser.add_argument('--requests', type=int, default=100, help='per route')
+    parser.add_argument('--warmup', type=int, default=5, help='untimed requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--url', help='drive a running server instead of the test client')
+    parser.add_argument('--cache', action='store_true', help='leave the page cache on')
+    parser.add_argument('--routes', nargs='+', help='only these endpoints')
+    parser.add_argument('--baseline', help='compare with this saved run')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--save-baseline', help='write this run to a file')
+    args = parser.parse_args()
+
+    check_coverage()
+    cache.enabled = args.cache
+    if not args.url and not app.config.get('ADMIN_TOKEN'):
+        app.config['ADMIN_TOKEN'] = secrets.token_hex(16)
+    with app.app_context():
+        if not args.no_reset:
+            reset_database()
+            generate(args.venues, args.artists, args.shows, args.seed)
+        sizes = {
+            "venues": db.session.query(db.func.max(Venue.id)).scalar() or 1,
+            "artists": db.session.query(db.func.max(Artist.id)).scalar() or 1,
+        }
+        dialect = db.engine.dialect.name
+        db.session.remove()
+
+    transport = HTTPTransport(args.url) if args.url else ClientTransport()
+    endpoints = args.routes or list(SCENARIOS)
+
+    print(f'{"route":<34} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"errors":>6}')
+    results = {}
+    started = time.perf_counter()
+    for endpoint in endpoints:
+        if args.warmup and SCENARIOS[endpoint][0][0] == 'GET':
+            run_route(transport, endpoint, args.warmup, 1, sizes)
+        result = results[endpoint] = run_route(transport, endpoint, args.requests, args.concurrency, sizes)
+        print(f'{endpoint:<34} {result["rps"]:>8.1f} {result["p50"]:>8.2f} {result["p95"]:>8.2f} '
+              f'{result["p99"]:>8.2f} {result["errors"]:>6}')
+    total = sum(result['requests'] for result in results.values())
+    print(f'{total} requests in {time.perf_counter() - started:.1f}s')
+
+    run = {
+        "meta": {
+            "at": datetime.now().isoformat(timespec='seconds'),
+            "revision": _revision(),
+            "database": dialect if not args.url else args.url,
+            "python": platform.python_version(),
+            "catalog": {"venues": args.venues, "artists": args.artists, "shows": args.shows, "seed": args.seed},
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "cache": args.cache,
+        },
+        "routes": results,
+    }
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump(run, file, indent=2)
+        print(f'baseline saved to {args.save_baseline}')
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline['meta']['catalog'] != run['meta']['catalog']:
+            print(f'note: baseline catalog {baseline["meta"]["catalog"]} differs from this run')
+        regressions = compare(results, baseline, args.tolerance)
+        for endpoint, metric, before, after in regressions:
+            print(f'REGRESSION {endpoint} {metric}: {before:.2f} -> {after:.2f} ms')
+        print(f'{len(regressions)} regression(s) against {args.baseline} '
+              f'(revision {baseline["meta"].get("revision")})')
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
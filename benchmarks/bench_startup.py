@@ -0,0 +1,91 @@
+"""Cold-start time: interpreter, imports, create_app() and the first requests.
+
+Each run is a fresh interpreter, so nothing is cached between them:
+
+    DATABASE_URL=sqlite:////tmp/fyyur-bench.db python -m benchmarks.bench_startup --runs 10
+    python -m benchmarks.bench_startup --paths / /venues/create /venues --importtime 15
+
+`import` is the time to import app.py and everything it imports,
+`create_app` the time to build the app, and `first request` the time of the
+first request to each path (templates compile, lazily imported modules
+load); `second request` is the same path again, for comparison. Paths that
+read the database need DATABASE_URL to point at a seeded catalog
+(benchmarks/datagen.py). With --importtime, the slowest modules imported at
+startup are listed, from `python -X importtime`.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+flask_app = app.create_app()
+created = time.perf_counter()
+client = flask_app.test_client()
+timings = {"import": imported - started, "create_app": created - imported}
+for path in sys.argv[1:]:
+    for attempt in ("first request", "second request"):
+        before = time.perf_counter()
+        status = client.get(path).status_code
+        timings[f"{attempt} {path}"] = time.perf_counter() - before
+        if status >= 400:
+            timings[f"status {path}"] = status
+print(json.dumps(timings))
+'''
+
+
+def run_child(paths):
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-c', CHILD, *paths],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def import_times(limit):
+    """[(cumulative ms, module)] for the slowest top-level imports of app.py."""
+    result = subprocess.run([sys.executable, '-W', 'ignore', '-X', 'importtime', '-c', 'import app'],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Direct imports of app.py only: one level of indentation below it.
+        if name.startswith('   ') and not name.startswith('    '):
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return sorted(modules, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--paths', nargs='+', default=['/', '/venues/create'])
+    parser.add_argument('--importtime', type=int, default=0, metavar='N', help='list the N slowest imports')
+    args = parser.parse_args()
+
+    runs = [run_child(args.paths) for _ in range(args.runs)]
+    print(f'{"phase":<40} {"median ms":>10} {"min ms":>10}')
+    for phase in runs[0]:
+        if phase.startswith('status '):
+            print(f'{phase:<40} {runs[0][phase]:>10}')
+            continue
+        values = [run[phase] * 1000 for run in runs]
+        print(f'{phase:<40} {statistics.median(values):>10.1f} {min(values):>10.1f}')
+    total = [run['import'] + run['create_app'] for run in runs]
+    print(f'{"import + create_app":<40} {statistics.median(total) * 1000:>10.1f} {min(total) * 1000:>10.1f}')
+
+    if args.importtime:
+        print(f'\n{"import (cumulative)":<40} {"ms":>10}')
+        for milliseconds, module in import_times(args.importtime):
+            print(f'{module:<40} {milliseconds:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
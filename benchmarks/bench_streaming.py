@@ -0,0 +1,50 @@
+"""Time to first byte and peak memory of the streamed listing pages.
+
+Point DATABASE_URL at a scratch database (it is dropped and re-seeded):
+
+    DATABASE_URL=sqlite:////tmp/fyyur-bench.db python -m benchmarks.bench_streaming
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks.common import app, reset_database, seed
+
+
+def measure(client, path):
+    """(seconds to first chunk, total seconds, peak traced bytes, body bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    response = client.get(path, buffered=False)
+    chunks = iter(response.response)
+    size = len(next(chunks, b''))
+    first_byte = time.perf_counter() - start
+    for chunk in chunks:
+        size += len(chunk)
+    total = time.perf_counter() - start
+    response.close()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first_byte, total, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--paths', nargs='+', default=['/shows?stream=1', '/artists?stream=1', '/venues?stream=1'])
+    args = parser.parse_args()
+
+    print(f'{"shows":>8} {"path":<20} {"ttfb ms":>8} {"total ms":>9} {"peak KiB":>9} {"body KiB":>9}')
+    with app.app_context():
+        for size in args.sizes:
+            reset_database()
+            seed(venues=max(size // 10, 1), artists=max(size // 10, 1), shows=size)
+            client = app.test_client()
+            for path in args.paths:
+                first_byte, total, peak, body = measure(client, path)
+                print(f'{size:>8} {path:<20} {first_byte * 1000:>8.1f} {total * 1000:>9.1f} '
+                      f'{peak / 1024:>9.0f} {body / 1024:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""Queries and latency of /venues as the number of venues grows.
+
+Point DATABASE_URL at a scratch database (it is dropped and re-seeded):
+
+    DATABASE_URL=sqlite:////tmp/fyyur-bench.db python -m benchmarks.bench_venues
+"""
+import argparse
+
+from benchmarks.common import app, reset_database, seed, time_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 3000])
+    parser.add_argument('--shows-per-venue', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f'{"venues":>8} {"queries":>8} {"median ms":>10}')
+    with app.app_context():
+        for size in args.sizes:
+            reset_database()
+            seed(venues=size, artists=max(size // 10, 1), shows=size * args.shows_per_venue)
+            latency, queries = time_request(app.test_client(), 'get', '/venues', repeat=args.repeat)
+            print(f'{size:>8} {queries:>8} {latency * 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
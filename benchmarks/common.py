@@ -0,0 +1,85 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import event
+
+from wsgi import app
+from db import db
+from models import Venue, Artist, Show
+import counters
+
+#----------------------------------------------------------------------------#
+# Helpers shared by the benchmark scripts.
+#----------------------------------------------------------------------------#
+
+STATES = ['CA', 'NY', 'TX', 'WA', 'IL', 'FL', 'OR', 'MA']
+CITIES = ['San Francisco', 'New York', 'Austin', 'Seattle', 'Chicago', 'Miami', 'Portland', 'Boston']
+GENRES = ['Jazz', 'Reggae', 'Swing', 'Classical', 'Folk', 'Rock n Roll', 'Hip-Hop', 'Blues']
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, *args, **kwargs):
+        self.count += 1
+
+
+@contextmanager
+def count_queries():
+    """Count the statements sent to the database inside the block."""
+    counter = QueryCounter()
+    event.listen(db.engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', counter)
+
+
+def reset_database():
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+
+
+def seed(venues, artists, shows, seed=0):
+    """Insert a deterministic catalog of the given size."""
+    # datagen imports this module.
+    from benchmarks.datagen import show_rows
+
+    rng = random.Random(seed)
+    now = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    db.session.execute(Venue.__table__.insert(), [{
+        "name": f'Venue {i}',
+        "city": CITIES[i % len(CITIES)],
+        "state": STATES[i % len(STATES)],
+        "genres": rng.sample(GENRES, 2),
+    } for i in range(venues)])
+    db.session.execute(Artist.__table__.insert(), [{
+        "name": f'Artist {i}',
+        "city": CITIES[i % len(CITIES)],
+        "state": STATES[i % len(STATES)],
+        "genres": rng.sample(GENRES, 2),
+    } for i in range(artists)])
+    if shows:
+        # No venue or artist double-booked, as the scheduling checks require.
+        db.session.execute(Show.__table__.insert(), list(show_rows(shows, venues, artists, rng, now)))
+    db.session.commit()
+    # Also refreshes the area directory.
+    counters.recount()
+
+
+def time_request(client, method, path, repeat=5, **kwargs):
+    """Median latency (seconds) and statement count for one request."""
+    timings = []
+    for i in range(repeat):
+        with count_queries() as counter:
+            start = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            timings.append(time.perf_counter() - start)
+        assert response.status_code == 200, (path, response.status_code)
+    return statistics.median(timings), counter.count
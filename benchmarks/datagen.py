@@ -0,0 +1,210 @@
+"""Deterministic synthetic catalog, at any size.
+
+    DATABASE_URL=postgresql://localhost/fyyur_bench python -m benchmarks.datagen \\
+        --venues 10000 --artists 50000 --shows 1000000 --reset
+
+The same --seed always produces the same rows (start times are relative to
+--now, today at midnight by default). Genres follow a long-tailed
+popularity curve, each venue/artist has one to four of them, venues and
+artists are clustered in a few big cities, some venues and artists host
+many more shows than others, and shows fall on evenings, mostly in the past two
+years with the rest over the next six months. No venue or artist is booked for two
+shows at once.
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from collections import defaultdict
+from itertools import accumulate
+
+from benchmarks.common import app, reset_database
+from db import db
+from models import Venue, Artist, Show, DEFAULT_SHOW_MINUTES
+import counters
+
+# Same choices as the forms, most popular first.
+GENRES = [
+    'Rock n Roll', 'Pop', 'Hip-Hop', 'Jazz', 'Electronic', 'Alternative', 'Blues', 'Folk', 'Country',
+    'Soul', 'R&B', 'Punk', 'Heavy Metal', 'Funk', 'Reggae', 'Classical', 'Instrumental',
+    'Musical Theatre', 'Other',
+]
+GENRE_WEIGHTS = [1 / rank for rank in range(1, len(GENRES) + 1)]
+GENRE_COUNTS = [1, 2, 3, 4]
+GENRE_COUNT_WEIGHTS = [35, 35, 20, 10]
+
+# (city, state, relative size)
+AREAS = [
+    ('New York', 'NY', 30), ('Los Angeles', 'CA', 22), ('Chicago', 'IL', 14), ('Houston', 'TX', 10),
+    ('Austin', 'TX', 9), ('Nashville', 'TN', 9), ('San Francisco', 'CA', 8), ('Seattle', 'WA', 7),
+    ('New Orleans', 'LA', 6), ('Atlanta', 'GA', 6), ('Boston', 'MA', 5), ('Denver', 'CO', 5),
+    ('Portland', 'OR', 4), ('Miami', 'FL', 4), ('Detroit', 'MI', 3), ('Minneapolis', 'MN', 3),
+    ('Philadelphia', 'PA', 3), ('Memphis', 'TN', 2), ('Kansas City', 'MO', 2), ('Burlington', 'VT', 1),
+]
+AREA_WEIGHTS = list(accumulate(size for _, _, size in AREAS))
+
+ADJECTIVES = ['Blue', 'Golden', 'Velvet', 'Electric', 'Midnight', 'Crimson', 'Silver', 'Wild', 'Lonely',
+              'Broken', 'Neon', 'Rusty', 'Hollow', 'Lucky', 'Quiet', 'Royal', 'Painted', 'Iron']
+NOUNS = ['Owl', 'Anchor', 'Lantern', 'Crow', 'Harbor', 'Rose', 'Fox', 'Engine', 'Moon', 'Tiger',
+         'Garden', 'Canyon', 'Echo', 'Arrow', 'River', 'Saint', 'Wolf', 'Parlor']
+VENUE_KINDS = ['Hall', 'Club', 'Lounge', 'Theatre', 'Ballroom', 'Bar', 'Music Venue', 'Tavern']
+FIRST_NAMES = ['Ada', 'Miles', 'Nina', 'Otis', 'Etta', 'Hank', 'Patti', 'Joni', 'Prince', 'Aretha',
+               'Buddy', 'Dolly', 'Ray', 'Billie', 'Woody', 'Carole', 'Sam', 'Lou']
+LAST_NAMES = ['Reed', 'King', 'Holly', 'Simone', 'Parton', 'Waters', 'Davis', 'Cash', 'Mitchell',
+              'Redding', 'James', 'Smith', 'Guthrie', 'Cooke', 'Franklin', 'Charles', 'Young', 'Brown']
+
+PAST_DAYS = 730
+FUTURE_DAYS = 180
+PAST_SHARE = 0.7
+MAX_DRAWS = 20
+
+
+def _genres(rng):
+    count = rng.choices(GENRE_COUNTS, GENRE_COUNT_WEIGHTS)[0]
+    genres = []
+    while len(genres) < count:
+        genre = rng.choices(GENRES, GENRE_WEIGHTS)[0]
+        if genre not in genres:
+            genres.append(genre)
+    return genres
+
+
+def _area(rng):
+    city, state, _ = rng.choices(AREAS, cum_weights=AREA_WEIGHTS)[0]
+    return city, state
+
+
+def _phone(rng):
+    return f'{rng.randint(201, 989)}-{rng.randint(200, 999)}-{rng.randint(0, 9999):04d}'
+
+
+def _slug(name):
+    return ''.join(ch for ch in name.lower() if ch.isalnum())
+
+
+def venue_rows(count, rng):
+    for i in range(count):
+        city, state = _area(rng)
+        name = f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {rng.choice(VENUE_KINDS)} {i + 1}'
+        seeking = rng.random() < 0.3
+        yield {
+            "name": name,
+            "city": city,
+            "state": state,
+            "address": f'{rng.randint(1, 9999)} {rng.choice(NOUNS)} Street',
+            "phone": _phone(rng),
+            "genres": _genres(rng),
+            "image_link": f'https://images.example.com/venues/{i + 1}.jpg',
+            "facebook_link": f'https://www.facebook.com/{_slug(name)}',
+            "website_link": f'https://{_slug(name)}.example.com',
+            "seeking_talent": seeking,
+            "seeking_description": 'Looking for local acts on weeknights.' if seeking else None,
+        }
+
+
+def artist_rows(count, rng):
+    for i in range(count):
+        city, state = _area(rng)
+        if rng.random() < 0.5:
+            name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i + 1}'
+        else:
+            name = f'The {rng.choice(ADJECTIVES)} {rng.choice(NOUNS)}s {i + 1}'
+        seeking = rng.random() < 0.4
+        yield {
+            "name": name,
+            "city": city,
+            "state": state,
+            "phone": _phone(rng),
+            "genres": _genres(rng),
+            "image_link": f'https://images.example.com/artists/{i + 1}.jpg',
+            "facebook_link": f'https://www.facebook.com/{_slug(name)}',
+            "website_link": f'https://{_slug(name)}.example.com',
+            "seeking_venue": seeking,
+            "seeking_description": 'Booking a summer tour.' if seeking else None,
+        }
+
+
+def _popular(rng, count):
+    # Pareto-distributed ids, so the low ids host many more shows than the rest.
+    return int((rng.paretovariate(1.5) - 1) * count / 10) % count
+
+
+def show_rows(count, venues, artists, rng, now):
+    # Start minutes already taken per (venue or artist, day). Shows start
+    # between 18:00 and 23:30 and last DEFAULT_SHOW_MINUTES, so only shows
+    # on the same evening can overlap; a draw that would double-book is
+    # drawn again, and after MAX_DRAWS the show is left out.
+    booked = defaultdict(list)
+    for _ in range(count):
+        for _ in range(MAX_DRAWS):
+            if rng.random() < PAST_SHARE:
+                day = -rng.randint(1, PAST_DAYS)
+            else:
+                day = rng.randint(0, FUTURE_DAYS)
+            minute = rng.randint(18, 23) * 60 + rng.choice((0, 30))
+            venue_id = _popular(rng, venues) + 1
+            artist_id = _popular(rng, artists) + 1
+            evenings = (('venue', venue_id, day), ('artist', artist_id, day))
+            if all(abs(minute - other) >= DEFAULT_SHOW_MINUTES for evening in evenings for other in booked[evening]):
+                break
+        else:
+            continue
+        for evening in evenings:
+            booked[evening].append(minute)
+        yield {
+            "venue_id": venue_id,
+            "artist_id": artist_id,
+            "start_time": now + timedelta(days=day, minutes=minute),
+            "duration_minutes": DEFAULT_SHOW_MINUTES,
+        }
+
+
+def _insert(table, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            db.session.execute(table.insert(), batch)
+            batch = []
+    if batch:
+        db.session.execute(table.insert(), batch)
+
+
+def generate(venues, artists, shows, seed=0, now=None, batch_size=5000):
+    """Bulk-insert the catalog into an empty database, then rebuild the
+    show counters and the area directory."""
+    rng = random.Random(seed)
+    if now is None:
+        now = datetime.combine(datetime.now().date(), datetime.min.time())
+
+    _insert(Venue.__table__, venue_rows(venues, rng), batch_size)
+    _insert(Artist.__table__, artist_rows(artists, rng), batch_size)
+    if shows and venues and artists:
+        _insert(Show.__table__, show_rows(shows, venues, artists, rng, now), batch_size)
+    db.session.commit()
+    # Also refreshes the area directory.
+    counters.recount()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--venues', type=int, default=1000)
+    parser.add_argument('--artists', type=int, default=5000)
+    parser.add_argument('--shows', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--now', type=datetime.fromisoformat, help='anchor for start times (ISO 8601)')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate the tables first')
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.reset:
+            reset_database()
+        started = time.perf_counter()
+        generate(args.venues, args.artists, args.shows, args.seed, args.now, args.batch_size)
+        print(f'{args.venues} venues, {args.artists} artists, {args.shows} shows '
+              f'in {time.perf_counter() - started:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g, has_app_context, jsonify, make_response, request, session
+
+#----------------------------------------------------------------------------#
+# Page and data cache.
+#
+# Entries are keyed by the versions of the namespaces they were built from
+# ('venues', 'artists', 'shows'). Write handlers bump those versions after
+# they commit, so later reads build new keys and never see stale data; the
+# orphaned entries simply age out of the LRU.
+#
+# Every process keeps an in-memory LRU with a TTL. With CACHE_SHARED_URL
+# set, namespace versions and entries also live in a shared backend so that
+# a bump in one worker is seen by all of them:
+#
+#   redis://host:6379/0   Redis (needs the `redis` package)
+#   memory://             in-process stand-in with the same interface, for
+#                         tests and single-worker setups
+#
+# A request reading from a replica (routing.py) may still see the data from
+# before a bump for READ_YOUR_WRITES_SECONDS, so in that window it does not
+# store what it built under the new versions; a primary read fills them.
+#----------------------------------------------------------------------------#
+
+class LRUCache:
+    """A thread-safe LRU mapping whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class MemorySharedBackend:
+    """Stand-in for a shared backend, kept in this process."""
+
+    def __init__(self):
+        self._values = LRUCache(maxsize=100000)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._values.get(key)
+
+    def set(self, key, value, ttl):
+        self._values.set(key, value, ttl)
+
+    def get_counters(self, keys):
+        with self._lock:
+            return [self._counters.get(key, 0) for key in keys]
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisSharedBackend:
+    def __init__(self, url):
+        import redis
+        self._redis = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._redis.get(key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        self._redis.set(key, pickle.dumps(value), ex=max(int(ttl), 1))
+
+    def get_counters(self, keys):
+        return [int(value or 0) for value in self._redis.mget(keys)]
+
+    def incr(self, key):
+        return self._redis.incr(key)
+
+
+def shared_backend_from_url(url):
+    if not url:
+        return None
+    if url.startswith('memory://'):
+        return MemorySharedBackend()
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisSharedBackend(url)
+    raise ValueError(f'Unsupported CACHE_SHARED_URL: {url}')
+
+
+class PageCache:
+    def __init__(self, app=None):
+        self.enabled = False
+        self.ttl = 300
+        self.local = LRUCache()
+        self.shared = None
+        self._versions = {}
+        self._bumped = {}
+        self.replica_lag = 5
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(['hits', 'local_hits', 'shared_hits', 'misses', 'stores', 'bumps'], 0)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_ENABLED', True)
+        app.config.setdefault('CACHE_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_SHARED_URL', None)
+
+        self.enabled = app.config['CACHE_ENABLED']
+        self.ttl = app.config['CACHE_TTL']
+        self.local = LRUCache(app.config['CACHE_MAX_ENTRIES'], self.ttl)
+        self.shared = shared_backend_from_url(app.config['CACHE_SHARED_URL'])
+        self.replica_lag = app.config.get('READ_YOUR_WRITES_SECONDS', 5)
+        app.extensions['page_cache'] = self
+        app.add_url_rule('/cache/stats', 'cache_stats', lambda: jsonify(self.stats()))
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = len(self.local)
+        stats['evictions'] = self.local.evictions
+        stats['shared'] = self.shared is not None
+        return stats
+
+    # Versions.
+
+    def versions(self, namespaces):
+        if self.shared is not None:
+            return self.shared.get_counters([f'version:{namespace}' for namespace in namespaces])
+        with self._lock:
+            return [self._versions.get(namespace, 0) for namespace in namespaces]
+
+    def bump(self, *namespaces):
+        """Invalidate everything built from `namespaces`; call after a commit."""
+        now = time.time()
+        for namespace in namespaces:
+            if self.shared is not None:
+                self.shared.incr(f'version:{namespace}')
+                self.shared.set(f'bumped:{namespace}', now, self.replica_lag)
+            else:
+                with self._lock:
+                    self._versions[namespace] = self._versions.get(namespace, 0) + 1
+            with self._lock:
+                self._bumped[namespace] = now
+            self._count('bumps')
+
+    def _bumped_at(self, namespace):
+        with self._lock:
+            bumped = self._bumped.get(namespace, 0)
+        if self.shared is not None:
+            bumped = max(bumped, self.shared.get(f'bumped:{namespace}') or 0)
+        return bumped
+
+    def storable(self, namespaces):
+        """Whether this request may store what it built from `namespaces`:
+        not from a replica that may lag behind their last bump."""
+        if not has_app_context() or getattr(g, 'db_replica', None) is None:
+            return True
+        since = time.time() - self.replica_lag
+        return all(self._bumped_at(namespace) < since for namespace in namespaces)
+
+    def key(self, name, namespaces):
+        versions = self.versions(namespaces)
+        return ':'.join(f'{namespace}={version}' for namespace, version in zip(namespaces, versions)) + ':' + name
+
+    # Entries.
+
+    def get(self, key):
+        value = self.local.get(key)
+        if value is not None:
+            self._count('hits')
+            self._count('local_hits')
+            return value
+        if self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self.local.set(key, value)
+                self._count('hits')
+                self._count('shared_hits')
+                return value
+        self._count('misses')
+        return None
+
+    def set(self, key, value):
+        self.local.set(key, value)
+        if self.shared is not None:
+            self.shared.set(key, value, self.ttl)
+        self._count('stores')
+
+    def get_or_set(self, name, namespaces, producer):
+        """Cached data: `producer()` is only called on a miss."""
+        if not self.enabled:
+            return producer()
+        key = self.key(f'data:{name}', namespaces)
+        value = self.get(key)
+        if value is None:
+            value = producer()
+            if self.storable(namespaces):
+                self.set(key, value)
+        return value
+
+    async def get_or_set_async(self, name, namespaces, producer):
+        """get_or_set() for the ASGI views: `producer()` returns an awaitable."""
+        if not self.enabled:
+            return await producer()
+        key = self.key(f'data:{name}', namespaces)
+        value = self.get(key)
+        if value is None:
+            value = await producer()
+            if self.storable(namespaces):
+                self.set(key, value)
+        return value
+
+    def page_key(self, namespaces):
+        """This request's page cache key, or None if it must not be cached.
+
+        Requests with pending flash messages bypass the cache (the messages
+        are rendered into the page).
+        """
+        if not self.enabled or request.method != 'GET' or '_flashes' in session:
+            return None
+        return self.key(f'page:{request.full_path}', namespaces)
+
+    def cached_page(self, key):
+        entry = self.get(key)
+        if entry is None:
+            return None
+        status, mimetype, body = entry
+        return Response(body, status=status, mimetype=mimetype)
+
+    def store_page(self, key, response, namespaces):
+        """Keep a complete 200 response; streamed ones are never stored."""
+        if response.status_code == 200 and not response.is_streamed and self.storable(namespaces):
+            self.set(key, (response.status_code, response.mimetype, response.get_data()))
+
+    def cached(self, *namespaces):
+        """Cache a GET view's rendered page until one of `namespaces` is bumped."""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                key = self.page_key(namespaces)
+                if key is None:
+                    return view(*args, **kwargs)
+
+                response = self.cached_page(key)
+                if response is not None:
+                    return response
+
+                response = make_response(view(*args, **kwargs))
+                self.store_page(key, response, namespaces)
+                return response
+            wrapper.cache_namespaces = namespaces
+            return wrapper
+        return decorator
+
+
+cache = PageCache()
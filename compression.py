@@ -0,0 +1,129 @@
+import zlib
+
+from flask import current_app, request
+
+#----------------------------------------------------------------------------#
+# Response compression.
+#
+# Text responses (pages, JSON, CSV and NDJSON exports) are compressed with
+# brotli or gzip, whichever the client prefers in Accept-Encoding (brotli
+# needs the `brotli` package). Buffered bodies are compressed at once if
+# they are at least COMPRESS_MIN_SIZE bytes. Streamed bodies are
+# compressed chunk by chunk and flushed after every chunk, so a streamed
+# listing still reaches the browser as it is rendered.
+#
+# Responses that already have a Content-Encoding (the precompressed
+# /assets bundles), files, partial and non-200 responses, and
+# `Cache-Control: no-transform` are left alone.
+#----------------------------------------------------------------------------#
+
+COMPRESSIBLE = (
+    'text/html', 'text/css', 'text/plain', 'text/csv', 'text/javascript',
+    'application/javascript', 'application/json', 'application/x-ndjson', 'application/xml', 'image/svg+xml',
+)
+
+
+def _brotli():
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli
+
+
+class GzipCompressor:
+    encoding = 'gzip'
+
+    def __init__(self, level):
+        # wbits 16 + MAX_WBITS: a gzip header and trailer around the deflate stream.
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    encoding = 'br'
+
+    def __init__(self, quality):
+        self._compressor = _brotli().Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def negotiate(accept_encodings, config):
+    """A compressor for the client's preferred supported encoding, or None."""
+    candidates = [(accept_encodings['gzip'], 1, 'gzip')]
+    if _brotli() is not None:
+        candidates.append((accept_encodings['br'], 2, 'br'))
+    quality, _, encoding = max(candidates)
+    if not quality:
+        return None
+    if encoding == 'br':
+        return BrotliCompressor(config['COMPRESS_BROTLI_QUALITY'])
+    return GzipCompressor(config['COMPRESS_LEVEL'])
+
+
+def _compressible(response, min_size):
+    if response.status_code != 200 or response.direct_passthrough:
+        return False
+    if 'Content-Encoding' in response.headers or 'no-transform' in response.cache_control:
+        return False
+    if response.mimetype not in COMPRESSIBLE:
+        return False
+    return response.is_streamed or response.calculate_content_length() >= min_size
+
+
+def _compress_stream(chunks, compressor, charset):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode(charset)
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress(response, accept_encodings, config):
+    """Compress `response` in place for the given Accept-Encoding, if worthwhile."""
+    if not config['COMPRESS_ENABLED'] or not _compressible(response, config['COMPRESS_MIN_SIZE']):
+        return response
+    # Whether or not this client gets a compressed body, others may.
+    response.vary.add('Accept-Encoding')
+    compressor = negotiate(accept_encodings, config)
+    if compressor is None:
+        return response
+
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, compressor, response.charset)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        response.set_data(compressor.compress(data) + compressor.finish())
+    response.headers['Content-Encoding'] = compressor.encoding
+    response.headers.pop('Accept-Ranges', None)
+    return response
+
+
+def _compress_response(response):
+    return compress(response, request.accept_encodings, current_app.config)
+
+
+def init_app(app):
+    app.config.setdefault('COMPRESS_ENABLED', True)
+    app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+    app.config.setdefault('COMPRESS_LEVEL', 6)
+    app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+    app.after_request(_compress_response)
@@ -0,0 +1,143 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, make_response, request, session
+from werkzeug.http import is_resource_modified
+
+#----------------------------------------------------------------------------#
+# Conditional GET.
+#
+# Every complete 200 text response to a GET gets a weak ETag (a hash of the
+# body), so a client that sends it back in If-None-Match gets a 304 instead
+# of the page again. That saves the transfer, not the rendering.
+#
+# Views decorated with @conditional(validator) also save the rendering:
+# validator(**view_args) returns (last changed, version) for the page's
+# data -- the newest updated_at behind it and, for changes no timestamp
+# records (deleted rows), a count -- or None for a missing row. A request
+# whose If-None-Match / If-Modified-Since still match gets a 304 after that
+# one query; otherwise the page is rendered and sent with Last-Modified and
+# an ETag derived from them. Apply @use_replica outside @conditional so the
+# validator reads the database the page is rendered from.
+#
+# Templates and assets are part of the page too: the ETag includes a hash
+# of them (the "release"), and Last-Modified is never earlier than their
+# newest file, so a deploy that changes them invalidates every page.
+#
+# Pages with pending flash messages are always rendered in full.
+#----------------------------------------------------------------------------#
+
+TEXT_MIMETYPES = ('text/html', 'text/plain', 'text/csv', 'application/json', 'application/x-ndjson')
+
+
+def _release_files(app):
+    from assets import BUNDLES
+
+    for root, _, files in os.walk(os.path.join(app.root_path, app.template_folder)):
+        for name in sorted(files):
+            yield os.path.join(root, name)
+    for sources in BUNDLES.values():
+        for source in sources:
+            yield os.path.join(app.static_folder, source)
+
+
+def release(app):
+    """(hash, last changed) of the templates and asset sources every page renders with."""
+    digest = hashlib.sha1()
+    changed = 0.0
+    for path in sorted(_release_files(app)):
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+        changed = max(changed, os.path.getmtime(path))
+    token = app.config['RELEASE'] or digest.hexdigest()[:12]
+    return token, datetime.fromtimestamp(int(changed), timezone.utc)
+
+
+def _as_utc(value):
+    # updated_at columns are naive UTC.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def validators(changed):
+    """(ETag, Last-Modified) for a validator's (last changed, version)."""
+    token, released = current_app.extensions['conditional_release']
+    last_modified, version = changed
+    last_modified = _as_utc(last_modified)
+    etag = f'{token}-{int(last_modified.timestamp() * 1000000)}-{version}'
+    # HTTP dates have whole seconds; the ETag keeps the precision.
+    return etag, max(last_modified.replace(microsecond=0), released)
+
+
+def applies():
+    return request.method in ('GET', 'HEAD') and '_flashes' not in session
+
+
+def not_modified(etag, last_modified):
+    """Whether this request's validators still match."""
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    response.last_modified = last_modified
+    if not response.cache_control.no_store:
+        # Revalidate every time instead of guessing a freshness lifetime.
+        response.cache_control.no_cache = True
+    return response
+
+
+def not_modified_response(etag, last_modified):
+    return set_validators(current_app.response_class(status=304), etag, last_modified)
+
+
+def conditional(validator, validator_async=None):
+    """Answer If-None-Match / If-Modified-Since for a page from validator(**view_args).
+
+    `validator_async(bind, **view_args)` does the same for the ASGI views.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not applies():
+                return view(*args, **kwargs)
+            changed = validator(*args, **kwargs)
+            if changed is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = validators(changed)
+            if not_modified(etag, last_modified):
+                return not_modified_response(etag, last_modified)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                set_validators(response, etag, last_modified)
+            return response
+        wrapper.validators = (validator, validator_async)
+        return wrapper
+    return decorator
+
+
+#----------------------------------------------------------------------------#
+# Body ETags.
+#----------------------------------------------------------------------------#
+
+def _add_etag(response):
+    if (
+        not current_app.config['ETAGS_ENABLED'] or request.method not in ('GET', 'HEAD')
+        or response.status_code != 200 or response.is_streamed or response.direct_passthrough
+        or 'ETag' in response.headers or 'Content-Encoding' in response.headers
+        or response.mimetype not in TEXT_MIMETYPES or response.cache_control.no_store
+    ):
+        return response
+    response.set_etag(hashlib.sha1(response.get_data()).hexdigest()[:20], weak=True)
+    if not response.cache_control.max_age:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    app.config.setdefault('ETAGS_ENABLED', True)
+    app.config.setdefault('RELEASE', None)
+    app.extensions['conditional_release'] = release(app)
+    app.after_request(_add_etag)
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# The app reads these on import; tests bind it to scratch databases of their own.
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur-test.db'))
+
+# Query budgets for every endpoint (query_budget.py), on by default in pytest.ini.
+pytest_plugins = ['query_budget']
@@ -0,0 +1,212 @@
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event
+
+from db import db
+from models import Venue, Artist, Show, CounterWatermark
+from cache import cache
+import area_directory
+
+#----------------------------------------------------------------------------#
+# Upcoming / past show counters.
+#
+# Venue and Artist carry upcoming_shows_count and past_shows_count so the
+# listings and search results read a column instead of counting shows. A
+# show counts as upcoming when it starts at or after the watermark, the
+# time of the last rollover:
+#
+# - creating, moving or deleting a Show adjusts the counters in the same
+#   flush, so they commit or roll back with it;
+# - `flask show-counters rollover`, run from cron every few minutes, moves
+#   the shows that started since the last run from upcoming to past and
+#   advances the watermark;
+# - `flask show-counters recount` rebuilds every counter from the Show
+#   table, e.g. after writes that bypassed the ORM.
+#
+# Both commands bump the 'venues' and 'artists' cache namespaces and
+# refresh the area directory (which lists upcoming_shows_count) when they
+# change counters.
+#
+# Show writes take a share lock on the watermark row and the rollover an
+# exclusive one, so a show is never counted against a stale watermark.
+#----------------------------------------------------------------------------#
+
+WATERMARK_ID = 1
+
+PARENTS = (
+    (Venue, 'venue_id'),
+    (Artist, 'artist_id'),
+)
+
+
+def _watermark(connection, lock=None):
+    """The watermark, creating it on first use; lock is None, 'share' or 'update'."""
+    table = CounterWatermark.__table__
+    query = db.select([table.c.rolled_over_at]).where(table.c.id == WATERMARK_ID)
+    if lock:
+        query = query.with_for_update(read=lock == 'share')
+    watermark = connection.execute(query).scalar()
+    if watermark is None:
+        watermark = datetime.now()
+        connection.execute(table.insert().values(id=WATERMARK_ID, rolled_over_at=watermark))
+    return watermark
+
+
+def parse_start_time(value):
+    # The create form hands the model its raw string.
+    if isinstance(value, str):
+        import dateutil.parser
+        return dateutil.parser.parse(value)
+    return value
+
+
+def _values(show):
+    return {"venue_id": show.venue_id, "artist_id": show.artist_id, "start_time": show.start_time}
+
+
+def count_shows(connection, shows, delta=1):
+    """Add `delta` to the counters of each show's venue and artist.
+
+    `shows` are Show objects or dicts with venue_id, artist_id and
+    start_time. Runs one executemany UPDATE per counter column.
+    """
+    shows = list(shows)
+    if not shows:
+        return
+    watermark = _watermark(connection, lock='share')
+    for parent, key in PARENTS:
+        table = parent.__table__
+        changes = Counter()
+        for show in shows:
+            values = show if isinstance(show, dict) else _values(show)
+            column = 'upcoming_shows_count' if parse_start_time(values['start_time']) >= watermark else 'past_shows_count'
+            changes[column, int(values[key])] += delta
+        for column in ('upcoming_shows_count', 'past_shows_count'):
+            params = [{"parent_id": parent_id, "delta": change}
+                      for (name, parent_id), change in changes.items() if name == column and change]
+            if params:
+                connection.execute(
+                    table.update().where(table.c.id == db.bindparam('parent_id')).values(
+                        {column: table.c[column] + db.bindparam('delta')}
+                    ),
+                    params,
+                )
+
+
+@event.listens_for(Show, 'after_insert')
+def _count_inserted_show(mapper, connection, show):
+    count_shows(connection, [show], 1)
+
+
+@event.listens_for(Show, 'after_delete')
+def _count_deleted_show(mapper, connection, show):
+    count_shows(connection, [show], -1)
+
+
+# Load the old value when these are set on an expired Show, so
+# after_update can see where the show was counted.
+for _attribute in (Show.venue_id, Show.artist_id, Show.start_time):
+    event.listen(_attribute, 'set', lambda target, value, oldvalue, initiator: value,
+                 active_history=True, retval=True)
+
+
+@event.listens_for(Show, 'after_update')
+def _count_moved_show(mapper, connection, show):
+    state = db.inspect(show)
+    before, after = {}, {}
+    for key in ('venue_id', 'artist_id', 'start_time'):
+        history = state.attrs[key].history
+        after[key] = getattr(show, key)
+        before[key] = history.deleted[0] if history.deleted else after[key]
+    if before != after:
+        count_shows(connection, [before], -1)
+        count_shows(connection, [after], 1)
+
+
+def recount(venue_ids=None, artist_ids=None):
+    """Rebuild the counters of the given venues/artists (all if None) from Show."""
+    connection = db.session.connection()
+    watermark = _watermark(connection, lock='update')
+    shows = Show.__table__
+    for (parent, key), ids in zip(PARENTS, (venue_ids, artist_ids)):
+        table = parent.__table__
+
+        def count(condition):
+            return db.select([db.func.count()]).where(
+                db.and_(shows.c[key] == table.c.id, condition)
+            ).scalar_subquery()
+
+        query = table.update().values(
+            upcoming_shows_count=count(shows.c.start_time >= watermark),
+            past_shows_count=count(shows.c.start_time < watermark),
+        )
+        if ids is not None:
+            query = query.where(table.c.id.in_(ids))
+        connection.execute(query)
+    db.session.commit()
+    cache.bump('venues', 'artists')
+    area_directory.request_refresh()
+
+
+def rollover(now=None):
+    """Move shows that started since the last rollover to the past counters.
+
+    Returns the number of shows moved.
+    """
+    if now is None:
+        now = datetime.now()
+    connection = db.session.connection()
+    previous = _watermark(connection, lock='update')
+    if now <= previous:
+        db.session.rollback()
+        return 0
+
+    shows = Show.__table__
+    window = db.and_(shows.c.start_time >= previous, shows.c.start_time < now)
+    moved = connection.execute(db.select([db.func.count()]).where(window)).scalar()
+    if moved:
+        for parent, key in PARENTS:
+            table = parent.__table__
+            passed = db.select([db.func.count()]).where(
+                db.and_(shows.c[key] == table.c.id, window)
+            ).scalar_subquery()
+            connection.execute(
+                table.update().where(
+                    table.c.id.in_(db.select([shows.c[key]]).where(window))
+                ).values(
+                    upcoming_shows_count=table.c.upcoming_shows_count - passed,
+                    past_shows_count=table.c.past_shows_count + passed,
+                )
+            )
+
+    watermarks = CounterWatermark.__table__
+    connection.execute(watermarks.update().where(watermarks.c.id == WATERMARK_ID).values(rolled_over_at=now))
+    db.session.commit()
+    if moved:
+        # Listings, search results and the area directory show the counters.
+        cache.bump('venues', 'artists')
+        area_directory.request_refresh()
+    return moved
+
+
+show_counters = AppGroup('show-counters', help='Maintain the upcoming/past show counters.')
+
+
+@show_counters.command('rollover')
+def rollover_command():
+    """Move shows that have started since the last run to the past."""
+    click.echo(f'{rollover()} shows rolled over')
+
+
+@show_counters.command('recount')
+def recount_command():
+    """Rebuild every counter from the Show table."""
+    recount()
+    click.echo('show counters rebuilt')
+
+
+def init_app(app):
+    app.cli.add_command(show_counters)
@@ -1,6 +1,40 @@
-from flask import Flask
-from flask_sqlalchemy import SQLAlchemy
+from flask import jsonify
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+from routing import RoutingSQLAlchemy
 
-app = Flask(__name__)
+db = RoutingSQLAlchemy()
 
-db = SQLAlchemy(app)
\ No newline at end of file
+#----------------------------------------------------------------------------#
+# Connection pool statistics.
+#----------------------------------------------------------------------------#
+
+pool_events = dict.fromkeys(['connects', 'checkouts', 'checkins', 'invalidations'], 0)
+
+
+def _counter(name):
+    def count(*args):
+        pool_events[name] += 1
+    return count
+
+
+event.listen(Pool, 'connect', _counter('connects'))
+event.listen(Pool, 'checkout', _counter('checkouts'))
+event.listen(Pool, 'checkin', _counter('checkins'))
+event.listen(Pool, 'invalidate', _counter('invalidations'))
+
+
+def pool_stats():
+    """Live state of this worker's connection pool plus lifetime counters."""
+    pool = db.engine.pool
+    stats = {"pool": type(pool).__name__, "status": pool.status()}
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        if hasattr(pool, name):
+            stats[name] = getattr(pool, name)()
+    stats.update(pool_events)
+    return stats
+
+
+def init_app(app):
+    db.init_app(app)
+    app.add_url_rule('/db/pool', 'pool_stats', lambda: jsonify(pool_stats()))
@@ -0,0 +1,148 @@
+import json
+import re
+import sys
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from db import db
+from models import Venue, Artist
+from cache import cache
+
+#----------------------------------------------------------------------------#
+# Query plan check.
+#
+# `flask explain-routes` requests each read route with the test client,
+# records the SELECTs it sends and EXPLAINs them, failing if any of them
+# reads a whole table instead of going through an index:
+#
+#   flask explain-routes                 # the default routes below
+#   flask explain-routes '/shows?page=...' -v
+#
+# tests/test_query_plans.py runs the same check on the default routes.
+#
+# On Postgres the plans are taken with enable_seqscan off, so a Seq Scan
+# means no index could serve the query, not that the table is small.
+# On SQLite a bare `SCAN <table>` (no USING INDEX) is a full scan.
+#----------------------------------------------------------------------------#
+
+ROUTES = [
+    '/venues',
+    '/artists',
+    '/shows',
+    '/venues/{venue_id}',
+    '/artists/{artist_id}',
+    '/venues/search?search_term=music',
+    '/artists/search?search_term=guns',
+    '/export/shows.csv?from=2000-01-01&to=2100-01-01',
+]
+
+
+class StatementRecorder:
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            self.statements.append((conn.engine, statement, parameters))
+
+
+def record_route(client, path):
+    """(status code, [(engine, statement, parameters)]) for one GET."""
+    recorder = StatementRecorder()
+    token = current_app.config.get('ADMIN_TOKEN')
+    # The export route needs the admin token (access.py).
+    headers = {"Authorization": f'Bearer {token}'} if token else {}
+    event.listen(Engine, 'before_cursor_execute', recorder)
+    try:
+        response = client.get(path, headers=headers)
+        response.close()
+    finally:
+        event.remove(Engine, 'before_cursor_execute', recorder)
+    return response.status_code, recorder.statements
+
+
+def _sqlite_plan(connection, statement, parameters):
+    rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+    details = [row[-1] for row in rows]
+    subqueries = {match.group(1) for detail in details
+                  for match in [re.match(r'(?:CO-ROUTINE|MATERIALIZE) (\S+)', detail)] if match}
+    full_scans = []
+    for detail in details:
+        match = re.match(r'SCAN (\S+)(?: AS \S+)?$', detail)
+        if match and match.group(1) not in subqueries:
+            full_scans.append(match.group(1))
+    return details, full_scans
+
+
+def _postgres_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from _postgres_nodes(child)
+
+
+def _postgres_plan(connection, statement, parameters):
+    with connection.begin():
+        connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+        plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) ' + statement, parameters).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    nodes = list(_postgres_nodes(plan[0]['Plan']))
+    details = [' '.join(filter(None, (node['Node Type'], node.get('Relation Name'), node.get('Index Name'))))
+               for node in nodes]
+    full_scans = [node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan']
+    return details, full_scans
+
+
+def explain(engine, statement, parameters):
+    """(plan lines, tables read in full) for one recorded statement."""
+    plan = _sqlite_plan if engine.dialect.name == 'sqlite' else _postgres_plan
+    with engine.connect() as connection:
+        return plan(connection, statement, parameters)
+
+
+def check_routes(paths, verbose=False, echo=print):
+    """EXPLAIN every SELECT the given routes run; return the failures."""
+    client = current_app.test_client()
+    failures = []
+    cache_enabled, cache.enabled = cache.enabled, False
+    try:
+        for path in paths:
+            status, statements = record_route(client, path)
+            echo(f'{path} -> {status}, {len(statements)} statement(s)')
+            for engine, statement, parameters in statements:
+                details, full_scans = explain(engine, statement, parameters)
+                if full_scans:
+                    failures.append((path, statement, full_scans))
+                    echo(f'  FULL SCAN of {", ".join(full_scans)}: {" ".join(statement.split())[:120]}')
+                if verbose or full_scans:
+                    for detail in details:
+                        echo(f'    {detail}')
+    finally:
+        cache.enabled = cache_enabled
+        db.session.remove()
+    return failures
+
+
+@click.command('explain-routes')
+@click.argument('paths', nargs=-1)
+@click.option('-v', '--verbose', is_flag=True, help='Print every plan, not only failing ones.')
+@with_appcontext
+def explain_routes_command(paths, verbose):
+    """Fail if a read route's queries scan a whole table."""
+    if not paths:
+        ids = {
+            "venue_id": db.session.query(db.func.min(Venue.id)).scalar() or 1,
+            "artist_id": db.session.query(db.func.min(Artist.id)).scalar() or 1,
+        }
+        paths = [path.format(**ids) for path in ROUTES]
+    failures = check_routes(paths, verbose, click.echo)
+    click.echo(f'{len(failures)} statement(s) without an index')
+    sys.exit(1 if failures else 0)
+
+
+def init_app(app):
+    app.cli.add_command(explain_routes_command)
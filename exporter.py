@@ -0,0 +1,192 @@
+import csv
+import io
+import json
+import time
+from datetime import date, datetime
+
+import click
+from flask import Response, current_app, jsonify, request, stream_with_context
+from flask.cli import with_appcontext
+
+from db import db
+from models import Venue, Artist, Show
+from routing import use_replica
+from access import admin_required
+
+#----------------------------------------------------------------------------#
+# Catalog export.
+#
+# Venues, artists or shows are streamed as CSV or NDJSON straight from a
+# server-side cursor (stream_results): rows are fetched and serialized
+# EXPORT_BATCH_SIZE at a time, so memory stays flat however large the
+# catalog is. Shows carry their artist and venue names from the same query.
+#
+#   flask export-catalog shows --since 2026-10-17T00:00 -o shows.ndjson
+#   curl -H "Authorization: Bearer $ADMIN_TOKEN" 'localhost:5000/export/shows.csv?from=2026-11-01&to=2026-12-01'
+#
+# `since` keeps rows whose updated_at (UTC) is at or after it; `from` / `to`
+# bound show start times, `to` exclusive. CSV lists (genres) are joined with
+# ';', the format the importer reads back.
+#----------------------------------------------------------------------------#
+
+LIST_SEPARATOR = ';'
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def _columns(model):
+    return list(model.__table__.columns)
+
+
+EXPORTS = {
+    'venues': lambda: (Venue, _columns(Venue)),
+    'artists': lambda: (Artist, _columns(Artist)),
+    'shows': lambda: (Show, [
+        Show.id,
+        Show.start_time,
+        Show.duration_minutes,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.city.label('venue_city'),
+        Venue.state.label('venue_state'),
+        Show.updated_at,
+    ]),
+}
+
+
+def export_query(kind, since=None, start=None, end=None):
+    """The SELECT for one export, ordered by id."""
+    model, columns = EXPORTS[kind]()
+    query = db.select(columns)
+    if model is Show:
+        query = query.select_from(Show).join(Artist, Show.artist_id == Artist.id).join(Venue, Show.venue_id == Venue.id)
+        if start is not None:
+            query = query.where(Show.start_time >= start)
+        if end is not None:
+            query = query.where(Show.start_time < end)
+    elif start is not None or end is not None:
+        raise ValueError('from/to only apply to shows')
+    if since is not None:
+        query = query.where(model.updated_at >= since)
+    return query.order_by(model.id)
+
+
+def _value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return LIST_SEPARATOR.join(value)
+    return _value(value)
+
+
+def export_rows(kind, format, since=None, start=None, end=None, batch_size=2000, stats=None):
+    """Yield the export as text chunks, one chunk per batch of rows.
+
+    `stats`, if given, is a dict that is kept updated with `rows` and
+    `seconds`.
+    """
+    if stats is None:
+        stats = {}
+    stats.update(rows=0, seconds=0.0)
+    started = time.perf_counter()
+
+    # Executed on the Core connection: the ORM would buffer every row.
+    connection = db.session.connection().execution_options(stream_results=True, max_row_buffer=batch_size)
+    result = connection.execute(export_query(kind, since, start, end))
+    keys = list(result.keys())
+
+    buffer = io.StringIO()
+    if format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(keys)
+        serialize = lambda row: writer.writerow([_csv_value(value) for value in row])
+    else:
+        serialize = lambda row: buffer.write(json.dumps(dict(zip(keys, map(_value, row)))) + '\n')
+
+    try:
+        for batch in result.partitions(batch_size):
+            for row in batch:
+                serialize(row)
+            stats['rows'] += len(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    finally:
+        result.close()
+        stats['seconds'] = time.perf_counter() - started
+
+
+def _timestamp(value, name):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO 8601 date or datetime')
+
+
+def export_catalog(kind, format):
+    """GET /export/<kind>.<format>: the whole catalog, streamed."""
+    if kind not in EXPORTS or format not in FORMATS:
+        return jsonify({"error": f'Unknown export: {kind}.{format}'}), 404
+    try:
+        since = _timestamp(request.args.get('since'), 'since')
+        start = _timestamp(request.args.get('from'), 'from')
+        end = _timestamp(request.args.get('to'), 'to')
+        export_query(kind, since, start, end)
+    except ValueError as error:
+        return jsonify({"error": str(error)}), 400
+
+    batch_size = request.args.get('batch_size', current_app.config['EXPORT_BATCH_SIZE'], type=int)
+    stats = {}
+    logger = current_app.logger
+
+    def generate():
+        yield from export_rows(kind, format, since, start, end, batch_size, stats)
+        logger.info('export %s.%s: %d rows in %.2fs (%.0f rows/s)', kind, format, stats['rows'],
+                    stats['seconds'], stats['rows'] / stats['seconds'] if stats['seconds'] else 0)
+
+    response = Response(stream_with_context(generate()), mimetype=FORMATS[format])
+    response.headers['Content-Disposition'] = f'attachment; filename={kind}.{format}'
+    return response
+
+
+@click.command('export-catalog')
+@click.argument('kind', type=click.Choice(sorted(EXPORTS)))
+@click.option('--format', type=click.Choice(sorted(FORMATS)), default='ndjson', show_default=True)
+@click.option('-o', '--output', type=click.File('w', encoding='utf-8'), default='-', help='Defaults to stdout.')
+@click.option('--since', type=click.DateTime(), help='Only rows updated at or after this time (UTC).')
+@click.option('--from', 'start', type=click.DateTime(), help='Shows starting at or after this time.')
+@click.option('--to', 'end', type=click.DateTime(), help='Shows starting before this time.')
+@click.option('--batch-size', type=int, help='Defaults to EXPORT_BATCH_SIZE.')
+@with_appcontext
+def export_catalog_command(kind, format, output, since, start, end, batch_size):
+    """Stream venues, artists or shows as CSV or NDJSON."""
+    try:
+        export_query(kind, since, start, end)
+    except ValueError as error:
+        raise click.UsageError(str(error))
+
+    stats = {}
+    for chunk in export_rows(kind, format, since, start, end, batch_size or current_app.config['EXPORT_BATCH_SIZE'], stats):
+        output.write(chunk)
+    output.flush()
+    rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+    click.echo(f'{stats["rows"]} {kind} exported in {stats["seconds"]:.2f}s ({rate:,.0f} rows/s)', err=True)
+
+
+def init_app(app):
+    app.config.setdefault('EXPORT_BATCH_SIZE', 2000)
+    app.add_url_rule('/export/<kind>.<format>', 'export_catalog', admin_required(use_replica(export_catalog)))
+    app.cli.add_command(export_catalog_command)
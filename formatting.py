@@ -0,0 +1,68 @@
+from datetime import date, datetime, time
+from functools import lru_cache
+
+#----------------------------------------------------------------------------#
+# Date formatting.
+#
+# babel.dates.format_datetime() re-resolves the locale and pattern on every
+# call, and the old filter also round-tripped each value through str() and
+# dateutil. Here datetimes are used as they are, and the compiled pattern
+# and Locale are cached per (format, locale).
+#
+# babel and dateutil are imported on first use; they are slow to import
+# and only needed once a page renders a date.
+#----------------------------------------------------------------------------#
+
+DATETIME_FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+# Names babel resolves from the locale's own datetime formats.
+BABEL_NAMED_FORMATS = ('long', 'short')
+
+
+@lru_cache(maxsize=64)
+def _compiled(format, locale):
+    import babel.dates
+
+    pattern = DATETIME_FORMATS.get(format, format)
+    return babel.dates.parse_pattern(pattern), babel.Locale.parse(locale)
+
+
+@lru_cache(maxsize=None)
+def _utc():
+    import babel.dates
+    return babel.dates.UTC
+
+
+def _as_datetime(value):
+    if isinstance(value, datetime):
+        date_value = value
+    elif isinstance(value, date):
+        date_value = datetime.combine(value, time())
+    else:
+        import dateutil.parser
+        date_value = dateutil.parser.parse(value)
+    # babel treats naive datetimes as UTC.
+    if date_value.tzinfo is None:
+        date_value = date_value.replace(tzinfo=_utc())
+    return date_value
+
+
+def format_datetime(value, format='medium', locale='en'):
+    """Format a datetime (or a string dateutil can parse) for display."""
+    if format in BABEL_NAMED_FORMATS:
+        import babel.dates
+        return babel.dates.format_datetime(_as_datetime(value), format, locale=locale)
+    pattern, locale = _compiled(format, locale)
+    return pattern.apply(_as_datetime(value), locale)
+
+
+def format_datetimes(values, format='medium', locale='en'):
+    """format_datetime() over a whole list, resolving the pattern once."""
+    if format in BABEL_NAMED_FORMATS:
+        return [format_datetime(value, format, locale) for value in values]
+    pattern, locale = _compiled(format, locale)
+    apply = pattern.apply
+    return [apply(_as_datetime(value), locale) for value in values]
@@ -1,19 +1,33 @@
 from datetime import datetime
 from flask_wtf import Form
-from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField, IntegerField
+from wtforms.validators import DataRequired, AnyOf, URL, Optional, NumberRange, Regexp
+from models import DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
+
+def _strip(value):
+    return value.strip() if isinstance(value, str) else value
 
 class ShowForm(Form):
+    # Optional: imports may name the artist and venue instead.
     artist_id = StringField(
-        'artist_id'
+        'artist_id',
+        validators=[Optional(), Regexp(r'^\d+$', message='Must be a numeric id.')],
+        filters=[_strip]
     )
     venue_id = StringField(
-        'venue_id'
+        'venue_id',
+        validators=[Optional(), Regexp(r'^\d+$', message='Must be a numeric id.')],
+        filters=[_strip]
     )
     start_time = DateTimeField(
         'start_time',
         validators=[DataRequired()],
-        default= datetime.today()
+        default=datetime.today
+    )
+    duration_minutes = IntegerField(
+        'duration_minutes',
+        validators=[Optional(), NumberRange(min=1, max=MAX_SHOW_MINUTES)],
+        default=DEFAULT_SHOW_MINUTES
     )
 
 class VenueForm(Form):
@@ -0,0 +1,117 @@
+from flask import request
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from db import db
+from models import Venue, Artist
+from cache import cache
+from async_db import adb
+
+#----------------------------------------------------------------------------#
+# Genre filters and facets.
+#
+# ?genre=Jazz&genre=Blues narrows a listing or search to rows tagged with
+# any of the genres (the default, ?match=any) or all of them (?match=all).
+#
+# Postgres: && (any) and @> (all) on the genres arrays, both served by the
+#   GIN indexes on Venue.genres / Artist.genres.
+# SQLite:   genres are JSON arrays, matched in the query with an EXISTS
+#   (any) or a count of distinct matches (all) over json_each(genres).
+#
+# Facet counts for the current results come from one GROUP BY over the
+# unnested genres (unnest() on Postgres, json_each() on SQLite).
+#----------------------------------------------------------------------------#
+
+GENRE_MATCHES = ('any', 'all')
+
+NAMESPACES = {
+    Venue: 'venues',
+    Artist: 'artists',
+}
+
+
+def requested_genres():
+    """(genres, match) from the request's `genre` and `match` parameters."""
+    genres = sorted({genre for genre in request.values.getlist('genre') if genre})
+    match = request.values.get('match', 'any')
+    if match not in GENRE_MATCHES:
+        match = 'any'
+    return genres, match
+
+
+def genre_args(genres, match):
+    """URL parameters that carry a genre filter onto other links."""
+    if not genres:
+        return {}
+    return {"genre": genres, "match": match}
+
+
+def genre_filter(model, genres, match='any', columns=None):
+    """A WHERE clause for rows tagged with any/all of `genres`, or None.
+
+    `columns` is an (id, genres) pair to filter a copy of the model's rows,
+    such as the area directory, instead of the model itself.
+    """
+    if not genres:
+        return None
+    _, genres_column = columns or (model.id, model.genres)
+    if db.engine.dialect.name == 'postgresql':
+        values = db.literal(list(genres), ARRAY(db.String(120)))
+        if match == 'all':
+            return genres_column.contains(values)
+        return genres_column.overlap(values)
+
+    elements = db.func.json_each(genres_column).table_valued('value')
+    in_genres = elements.c.value.in_(list(genres))
+    if match == 'all':
+        matched = db.select([db.func.count(db.distinct(elements.c.value))]).where(in_genres).scalar_subquery()
+        return matched == len(set(genres))
+    return db.select([elements.c.value]).where(in_genres).exists()
+
+
+def genre_facets_query(model, *criteria):
+    """(name, count) rows of the genres of the rows matching `criteria`."""
+    if db.engine.dialect.name == 'postgresql':
+        unnested = db.func.unnest(model.genres).table_valued('genre').render_derived()
+        genre = unnested.c.genre
+    else:
+        unnested = db.func.json_each(model.genres).table_valued('value')
+        genre = unnested.c.value
+
+    count = db.func.count().label('count')
+    query = db.session.query(genre.label('name'), count).select_from(model).join(unnested, db.true())
+    for criterion in criteria:
+        if criterion is not None:
+            query = query.filter(criterion)
+    return query.group_by(genre).order_by(count.desc(), genre)
+
+
+def facet_list(rows, selected=()):
+    facets = [{"name": row.name, "count": row.count, "selected": row.name in selected} for row in rows]
+    # Keep selected genres that no longer match anything, so they can be unselected.
+    found = {facet['name'] for facet in facets}
+    facets.extend({"name": name, "count": 0, "selected": True} for name in selected if name not in found)
+    return facets
+
+
+def genre_facets(model, *criteria, selected=()):
+    """[{name, count, selected}] over the rows matching `criteria`, most common first."""
+    return facet_list(genre_facets_query(model, *criteria).all(), selected)
+
+
+def listing_facets_key(model, genres, match='any'):
+    return f'genre-facets:{model.__tablename__}:{match}:{",".join(genres)}'
+
+
+def listing_facets(model, genres, match='any'):
+    """genre_facets() over a whole listing, cached until its namespace is bumped."""
+    return cache.get_or_set(listing_facets_key(model, genres, match), (NAMESPACES[model],), lambda: genre_facets(
+        model, genre_filter(model, genres, match), selected=genres,
+    ))
+
+
+async def listing_facets_async(model, genres, match='any', bind=None):
+    """listing_facets() for the ASGI views, run on the async engine."""
+    async def facets():
+        rows = await adb.fetch(genre_facets_query(model, genre_filter(model, genres, match)), bind)
+        return facet_list(rows, genres)
+    return await cache.get_or_set_async(listing_facets_key(model, genres, match), (NAMESPACES[model],), facets)
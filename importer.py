@@ -0,0 +1,311 @@
+import csv
+import io
+import json
+import time
+from collections import namedtuple
+from functools import lru_cache
+from itertools import islice
+
+import click
+from flask import jsonify, request
+from flask.cli import with_appcontext
+from sqlalchemy.exc import DBAPIError
+from werkzeug.datastructures import MultiDict
+
+from db import db
+from models import Venue, Artist, Show, DEFAULT_SHOW_MINUTES
+from cache import cache
+from access import admin_required
+import counters
+import scheduling
+import area_directory
+
+#----------------------------------------------------------------------------#
+# Bulk import.
+#
+# CSV or JSON-lines catalogs are read lazily and processed in batches:
+# every row is validated with the same form the create pages use, show
+# rows have their artist/venue references resolved with one query per
+# batch, and the valid rows of a batch are written with a single
+# executemany INSERT in their own transaction. Rows that fail are reported
+# with their line number instead of aborting the import.
+#
+#   flask import-catalog venues venues.csv
+#   curl -X POST --data-binary @shows.jsonl -H 'Content-Type: application/x-ndjson' \
+#        -H "Authorization: Bearer $ADMIN_TOKEN" localhost:5000/import/shows
+#
+# The endpoint needs the admin token, and a CSRF token for multipart
+# uploads (access.py).
+#
+# In CSV, list columns (genres) are separated with ';'. Shows reference
+# their artist and venue by `artist_id` / `venue_id`, or by exact
+# `artist_name` / `venue_name`; a show that would double-book either is
+# reported, checked against the catalog and the rest of its batch at once
+# (scheduling.py).
+#----------------------------------------------------------------------------#
+
+MAX_REPORTED_ERRORS = 100
+LIST_SEPARATOR = ';'
+
+# kind -> (model, form class in forms.py); forms (wtforms) load on first import.
+IMPORTS = {
+    'venues': (Venue, 'VenueForm'),
+    'artists': (Artist, 'ArtistForm'),
+    'shows': (Show, 'ShowForm'),
+}
+
+# Stands in for a line that is not a row at all; reported like a row that fails validation.
+MalformedRow = namedtuple('MalformedRow', 'error')
+
+
+def _json_row(line):
+    try:
+        row = json.loads(line)
+    except ValueError as error:
+        return MalformedRow(f'Not valid JSON: {error}.')
+    if not isinstance(row, dict):
+        return MalformedRow('Expected a JSON object.')
+    return row
+
+
+def read_rows(stream, format):
+    """Yield (line number, row dict or MalformedRow) from a text stream of CSV or JSON lines."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for line_number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_number, _json_row(line)
+    else:
+        raise ValueError(f'Unknown import format: {format}')
+
+
+def _form_class(name):
+    import forms
+    return getattr(forms, name)
+
+
+@lru_cache(maxsize=None)
+def _multi_fields(form_class):
+    from wtforms import SelectMultipleField
+
+    return {
+        name for name in dir(form_class)
+        if getattr(getattr(form_class, name), 'field_class', None) is SelectMultipleField
+    }
+
+
+def _formdata(row, form_class):
+    """A MultiDict the form can validate, from a CSV or JSON row."""
+    multi_fields = _multi_fields(form_class)
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None or value is False or value == '':
+            continue
+        if isinstance(value, str) and value.lower() in ('false', 'no', '0') and key.startswith('seeking_'):
+            continue
+        if key in multi_fields and isinstance(value, str):
+            value = [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+        if isinstance(value, list):
+            for item in value:
+                formdata.add(key, str(item))
+        else:
+            formdata.add(key, value if isinstance(value, str) else str(value))
+    return formdata
+
+
+def _resolve(model, ids, names):
+    """Map existing ids and unique names of `model` to ids, in one query."""
+    if not ids and not names:
+        return set(), {}
+    rows = db.session.query(model.id, model.name).filter(
+        db.or_(model.id.in_(ids), model.name.in_(names))
+    ).all()
+    existing = {row.id for row in rows if row.id in ids}
+    by_name = {}
+    for row in rows:
+        if row.name in names:
+            by_name[row.name] = None if row.name in by_name else row.id
+    return existing, by_name
+
+
+def _resolve_shows(batch):
+    """Replace artist/venue references in validated show rows with ids."""
+    references = {}
+    for model, key in ((Artist, 'artist'), (Venue, 'venue')):
+        ids = {int(values[f'{key}_id']) for _, values, _ in batch if values.get(f'{key}_id')}
+        names = {row[f'{key}_name'] for _, _, row in batch if row.get(f'{key}_name')}
+        references[key] = _resolve(model, ids, names)
+
+    resolved, errors = [], []
+    for line, values, row in batch:
+        problems = {}
+        for key in ('artist', 'venue'):
+            existing, by_name = references[key]
+            if values.get(f'{key}_id'):
+                values[f'{key}_id'] = int(values[f'{key}_id'])
+                if values[f'{key}_id'] not in existing:
+                    problems[f'{key}_id'] = [f'No {key} with id {values[f"{key}_id"]}.']
+            elif row.get(f'{key}_name'):
+                values[f'{key}_id'] = by_name.get(row[f'{key}_name'])
+                if values[f'{key}_id'] is None:
+                    problems[f'{key}_name'] = [f'No unique {key} named {row[f"{key}_name"]!r}.']
+            else:
+                problems[f'{key}_id'] = ['This field is required.']
+        if problems:
+            errors.append((line, problems))
+        else:
+            resolved.append((line, values, row))
+    return resolved, errors
+
+
+def _schedule_shows(batch):
+    """Drop show rows that would double-book a venue or artist, checked as one batch."""
+    for _, values, _ in batch:
+        values['duration_minutes'] = values.get('duration_minutes') or DEFAULT_SHOW_MINUTES
+    shows = [values for _, values, _ in batch]
+    conflicts = {id(conflict.booking.show): conflict for conflict in scheduling.find_conflicts(shows)}
+    scheduled, errors = [], []
+    for line, values, row in batch:
+        if id(values) in conflicts:
+            errors.append((line, {"start_time": [scheduling.describe(conflicts[id(values)])]}))
+        else:
+            scheduled.append((line, values, row))
+    return scheduled, errors
+
+
+def _validate(form_class, row):
+    form = form_class(formdata=_formdata(row, form_class), meta={"csrf": False})
+    if form.validate():
+        return form.data, None
+    return None, form.errors
+
+
+def _write(model, rows):
+    db.session.execute(model.__table__.insert(), rows)
+    # Core inserts skip the ORM events that keep the show counters.
+    if model is Show:
+        counters.count_shows(db.session.connection(), rows)
+    db.session.commit()
+
+
+def _insert(model, batch):
+    """Write a batch in one transaction; fall back to row by row on failure."""
+    try:
+        _write(model, [values for _, values, _ in batch])
+        return len(batch), []
+    except DBAPIError:
+        db.session.rollback()
+
+    inserted, errors = 0, []
+    for line, values, _ in batch:
+        try:
+            _write(model, [values])
+            inserted += 1
+        except DBAPIError as error:
+            db.session.rollback()
+            errors.append((line, {"database": [str(error.orig)]}))
+    return inserted, errors
+
+
+def import_rows(kind, rows, batch_size=1000):
+    """Validate and insert (line number, row dict) pairs; return a report."""
+    model, form_name = IMPORTS[kind]
+    form_class = _form_class(form_name)
+    columns = set(model.__table__.columns.keys())
+    report = {"kind": kind, "rows": 0, "inserted": 0, "failed": 0, "errors": []}
+
+    def fail(line, errors):
+        report['failed'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append({"line": line, "errors": errors})
+
+    start = time.perf_counter()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, batch_size))
+        if not chunk:
+            break
+        report['rows'] += len(chunk)
+
+        batch = []
+        for line, row in chunk:
+            if isinstance(row, MalformedRow):
+                fail(line, {"row": [row.error]})
+                continue
+            values, errors = _validate(form_class, row)
+            if errors:
+                fail(line, errors)
+            else:
+                batch.append((line, {key: value for key, value in values.items() if key in columns}, row))
+
+        if model is Show:
+            batch, errors = _resolve_shows(batch)
+            batch, conflicts = _schedule_shows(batch)
+            for line, problems in errors + conflicts:
+                fail(line, problems)
+
+        if batch:
+            inserted, errors = _insert(model, batch)
+            report['inserted'] += inserted
+            for line, problems in errors:
+                fail(line, problems)
+
+    report['errors'].sort(key=lambda error: error['line'])
+    if report['inserted']:
+        cache.bump(kind)
+        if model is not Artist:
+            area_directory.request_refresh()
+    report['seconds'] = round(time.perf_counter() - start, 3)
+    report['rows_per_second'] = round(report['rows'] / report['seconds']) if report['seconds'] else None
+    return report
+
+
+def _format_of(filename, content_type=None):
+    if (content_type or '').startswith(('application/x-ndjson', 'application/jsonl', 'application/json')):
+        return 'jsonl'
+    if filename and filename.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    return 'csv'
+
+
+def import_catalog(kind):
+    """POST /import/<kind>: a CSV or JSON-lines body, or a multipart `file`."""
+    if kind not in IMPORTS:
+        return jsonify({"error": f'Unknown import kind: {kind}'}), 404
+
+    upload = request.files.get('file')
+    if upload is not None:
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8')
+        format = request.args.get('format') or _format_of(upload.filename, upload.mimetype)
+    else:
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8')
+        format = request.args.get('format') or _format_of(None, request.content_type)
+
+    batch_size = request.args.get('batch_size', 1000, type=int)
+    report = import_rows(kind, read_rows(stream, format), batch_size)
+    return jsonify(report), 200 if not report['failed'] else 207
+
+
+@click.command('import-catalog')
+@click.argument('kind', type=click.Choice(sorted(IMPORTS)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', type=click.Choice(['csv', 'jsonl']), help='Defaults to the file extension.')
+@click.option('--batch-size', default=1000, show_default=True)
+@with_appcontext
+def import_catalog_command(kind, path, format, batch_size):
+    """Bulk-import venues, artists or shows from a CSV or JSON-lines file."""
+    with open(path, newline='', encoding='utf-8') as stream:
+        report = import_rows(kind, read_rows(stream, format or _format_of(path)), batch_size)
+
+    click.echo(f'{report["inserted"]}/{report["rows"]} {kind} imported in {report["seconds"]}s '
+               f'({report["rows_per_second"]} rows/s), {report["failed"]} failed')
+    for error in report['errors']:
+        click.echo(f'  line {error["line"]}: {json.dumps(error["errors"])}', err=True)
+
+
+def init_app(app):
+    app.add_url_rule('/import/<kind>', 'import_catalog', admin_required(import_catalog), methods=['POST'])
+    app.cli.add_command(import_catalog_command)
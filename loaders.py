@@ -0,0 +1,441 @@
+import asyncio
+import calendar
+from datetime import datetime, timezone
+from itertools import groupby, islice
+
+from db import db
+from models import Venue, Artist, Show
+from pagination import keyset_page, keyset_query, keyset_result
+from formatting import format_datetimes
+from genres import genre_filter
+from windows import window_filter, month_bounds
+from area_directory import area_directory, AREA_DIRECTORY_KEY
+from async_db import adb
+
+#----------------------------------------------------------------------------#
+# Page loaders.
+#----------------------------------------------------------------------------#
+
+# Each listing has a query, the sort key it is paged on and a row -> template
+# dict mapper, shared by the paged loaders and the streaming ones. Streams
+# read the whole listing through a server-side cursor in `batch_size` rows.
+#
+# Show times are formatted here, a batch at a time, rather than through
+# the `datetime` filter row by row.
+
+SHOW_TIME_FORMAT = 'full'
+
+
+def _batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _filtered(query, model, genres, match, columns=None):
+    criterion = genre_filter(model, genres, match, columns)
+    return query if criterion is None else query.filter(criterion)
+
+
+def _venue_directory_query(genres=None, match='any'):
+    area = area_directory.c
+    return _filtered(db.session.query(
+        area.city,
+        area.state,
+        area.id,
+        area.name,
+        area.num_upcoming_shows,
+    ), Venue, genres, match, columns=(area.id, area.genres))
+
+VENUE_DIRECTORY_KEY = AREA_DIRECTORY_KEY
+
+
+def _group_areas(rows):
+    for (city, state), venues in groupby(rows, key=lambda row: (row.city, row.state)):
+        yield {
+            "city": city,
+            "state": state,
+            "venues": ({
+                "id": venue.id,
+                "name": venue.name,
+                "num_upcoming_shows": venue.num_upcoming_shows,
+            } for venue in venues),
+        }
+
+
+def venue_directory(page_token=None, per_page=50, genres=None, match='any'):
+    """A page of venues grouped by city/state, with their upcoming show counts.
+
+    One indexed read of the area directory (see area_directory.py), which
+    is as fresh as its last refresh. Pages are keyed on (city, state,
+    name, id), so an area may continue on the next page. `genres` / `match`
+    narrow it as described in genres.py.
+    """
+    page = keyset_page(_venue_directory_query(genres, match), VENUE_DIRECTORY_KEY, page_token, per_page)
+    areas = [dict(area, venues=list(area['venues'])) for area in _group_areas(page.items)]
+    return page._replace(items=areas)
+
+
+def stream_venue_directory(batch_size=500, genres=None, match='any'):
+    """Every area of the directory, lazily; each area's venues are lazy too."""
+    rows = _venue_directory_query(genres, match).order_by(*VENUE_DIRECTORY_KEY).yield_per(batch_size)
+    return _group_areas(rows)
+
+
+def _artist_listing_query(genres=None, match='any'):
+    return _filtered(db.session.query(Artist.id, Artist.name), Artist, genres, match)
+
+ARTIST_LISTING_KEY = [Artist.name, Artist.id]
+
+
+def _artist_row(row):
+    return {"id": row.id, "name": row.name}
+
+
+def artist_listing(page_token=None, per_page=50, genres=None, match='any'):
+    """A page of artist ids and names, ordered by name."""
+    page = keyset_page(_artist_listing_query(genres, match), ARTIST_LISTING_KEY, page_token, per_page)
+    return page._replace(items=[_artist_row(row) for row in page.items])
+
+
+def stream_artists(batch_size=500, genres=None, match='any'):
+    """Every artist, ordered by name, lazily."""
+    rows = _artist_listing_query(genres, match).order_by(*ARTIST_LISTING_KEY).yield_per(batch_size)
+    return (_artist_row(row) for row in rows)
+
+
+def _show_listing_query(start=None, end=None):
+    return db.session.query(
+        Show.id,
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+    ).join(
+        Venue, Show.venue_id == Venue.id
+    ).join(
+        Artist, Show.artist_id == Artist.id
+    ).filter(*window_filter(Show.start_time, start, end))
+
+SHOW_LISTING_KEY = [Show.start_time, Show.id]
+
+
+def _show_rows(rows):
+    start_times = format_datetimes([row.start_time for row in rows], SHOW_TIME_FORMAT)
+    return [{
+        "venue_id": row.venue_id,
+        "venue_name": row.venue_name,
+        "artist_id": row.artist_id,
+        "artist_name": row.artist_name,
+        "artist_image_link": row.artist_image_link,
+        "start_time": start_time,
+    } for row, start_time in zip(rows, start_times)]
+
+
+def show_listing(page_token=None, per_page=50, start=None, end=None):
+    """A page of shows with their artist and venue, ordered by start time,
+    optionally only those starting in [start, end) (windows.py)."""
+    page = keyset_page(_show_listing_query(start, end), SHOW_LISTING_KEY, page_token, per_page)
+    return page._replace(items=_show_rows(page.items))
+
+
+def stream_shows(batch_size=500, start=None, end=None):
+    """Every show (in [start, end)) with its artist and venue, ordered by start time, lazily."""
+    rows = _show_listing_query(start, end).order_by(*SHOW_LISTING_KEY).yield_per(batch_size)
+    for batch in _batched(rows, batch_size):
+        yield from _show_rows(batch)
+
+
+def show_calendar(first, venue_id=None, artist_id=None):
+    """Weeks (Monday first) of {"date", "count", "in_month"} for the month
+    starting on `first`, optionally for one venue or artist.
+
+    One GROUP BY over a range scan of the month's shows.
+    """
+    start, end = month_bounds(first)
+    day = db.func.date(Show.start_time)
+    query = db.session.query(day, db.func.count()).filter(*window_filter(Show.start_time, start, end))
+    if venue_id is not None:
+        query = query.filter(Show.venue_id == venue_id)
+    if artist_id is not None:
+        query = query.filter(Show.artist_id == artist_id)
+    # date() is a date on Postgres and an ISO string on SQLite.
+    counts = {str(day)[:10]: count for day, count in query.group_by(day)}
+    return [[{
+        "date": date,
+        "count": counts.get(date.isoformat(), 0),
+        "in_month": date.month == first.month,
+    } for date in week] for week in calendar.Calendar().monthdatescalendar(first.year, first.month)]
+
+
+def _split_shows(shows, now, row):
+    """Split shows into (past, upcoming) template rows, oldest first."""
+    past = []
+    upcoming = []
+    shows = sorted(shows, key=lambda show: show.start_time)
+    start_times = format_datetimes([show.start_time for show in shows], SHOW_TIME_FORMAT)
+    for show, start_time in zip(shows, start_times):
+        (upcoming if show.start_time >= now else past).append(row(show, start_time))
+    return past, upcoming
+
+
+def _windowed(shows, start, end):
+    """A Venue.shows / Artist.shows loader path limited to shows in [start, end)."""
+    criteria = window_filter(Show.start_time, start, end)
+    return shows.and_(*criteria) if criteria else shows
+
+
+def venue_detail(venue_id, now=None, start=None, end=None):
+    """Venue page data, or None if there is no such venue.
+
+    The venue, its shows (those in [start, end) if given) and the
+    performing artists are fetched with a single eager-loaded query; past
+    and upcoming are split in Python against one `now` so both lists agree
+    with each other.
+    """
+    if now is None:
+        now = datetime.now()
+
+    venue = Venue.query.options(
+        db.joinedload(_windowed(Venue.shows, start, end)).joinedload(Show.artist).load_only(
+            Artist.id, Artist.name, Artist.image_link
+        )
+    ).filter(Venue.id == venue_id).one_or_none()
+    if venue is None:
+        return None
+
+    past, upcoming = _split_shows(venue.shows, now, lambda show, start_time: {
+        "artist_image_link": show.artist.image_link,
+        "start_time": start_time,
+        "artist_id": show.artist_id,
+        "artist_name": show.artist.name,
+    })
+    return _venue_data(venue, past, upcoming)
+
+
+def _venue_data(venue, past, upcoming):
+    return {
+        "name": venue.name,
+        "id": venue.id,
+        "genres": venue.genres,
+        "city": venue.city,
+        "state": venue.state,
+        "address": venue.address,
+        "phone": venue.phone,
+        "website_link": venue.website_link,
+        "facebook_link": venue.facebook_link,
+        "seeking_talent": venue.seeking_talent,
+        "seeking_description": venue.seeking_description,
+        "image_link": venue.image_link,
+        "upcoming_shows": upcoming,
+        "past_shows": past,
+        "upcoming_shows_count": len(upcoming),
+        "past_shows_count": len(past),
+    }
+
+
+def artist_detail(artist_id, now=None, start=None, end=None):
+    """Artist page data, or None if there is no such artist.
+
+    Same shape as venue_detail(): one eager-loaded query for the artist,
+    its shows and their venues.
+    """
+    if now is None:
+        now = datetime.now()
+
+    artist = Artist.query.options(
+        db.joinedload(_windowed(Artist.shows, start, end)).joinedload(Show.venue).load_only(
+            Venue.id, Venue.name, Venue.image_link
+        )
+    ).filter(Artist.id == artist_id).one_or_none()
+    if artist is None:
+        return None
+
+    past, upcoming = _split_shows(artist.shows, now, lambda show, start_time: {
+        "venue_image_link": show.venue.image_link,
+        "start_time": start_time,
+        "venue_id": show.venue_id,
+        "venue_name": show.venue.name,
+    })
+    return _artist_data(artist, past, upcoming)
+
+
+def _artist_data(artist, past, upcoming):
+    return {
+        "name": artist.name,
+        "id": artist.id,
+        "genres": artist.genres,
+        "city": artist.city,
+        "state": artist.state,
+        "phone": artist.phone,
+        "website_link": artist.website_link,
+        "facebook_link": artist.facebook_link,
+        "seeking_venue": artist.seeking_venue,
+        "seeking_description": artist.seeking_description,
+        "image_link": artist.image_link,
+        "upcoming_shows_count": len(upcoming),
+        "upcoming_shows": upcoming,
+        "past_shows_count": len(past),
+        "past_shows": past,
+    }
+
+
+#----------------------------------------------------------------------------#
+# Detail page validators, for conditional GET (conditional.py).
+#
+# A venue page shows the venue, its shows and their artists, and which of
+# the shows are past; it changes when any of their updated_at does, when a
+# show starts (and moves from upcoming to past) or when a show is deleted.
+# One grouped query over the same indexed join as the page returns all of
+# that as (last changed, number of shows), or None for a missing venue.
+#----------------------------------------------------------------------------#
+
+def _last_modified_query(model, model_id, show_key, other, other_key, now):
+    return db.session.query(
+        db.func.max(model.updated_at),
+        db.func.max(Show.updated_at),
+        db.func.max(other.updated_at),
+        db.func.max(db.case([(Show.start_time < now, Show.start_time)])),
+        db.func.count(Show.id),
+    ).select_from(model).outerjoin(
+        Show, show_key == model.id
+    ).outerjoin(
+        other, other.id == other_key
+    ).filter(model.id == model_id).group_by(model.id)
+
+
+def _last_modified(row):
+    if row is None:
+        return None
+    *updated, last_started, show_count = row
+    changed = [value for value in updated if value is not None]
+    if last_started is not None:
+        # Show times are local; updated_at is UTC.
+        changed.append(last_started.astimezone(timezone.utc).replace(tzinfo=None))
+    return max(changed), show_count
+
+
+def venue_last_modified(venue_id, now=None):
+    """(last changed, number of shows) of a venue page, or None if there is no such venue."""
+    query = _last_modified_query(Venue, venue_id, Show.venue_id, Artist, Show.artist_id, now or datetime.now())
+    return _last_modified(query.one_or_none())
+
+
+def artist_last_modified(artist_id, now=None):
+    """(last changed, number of shows) of an artist page, or None if there is no such artist."""
+    query = _last_modified_query(Artist, artist_id, Show.artist_id, Venue, Show.venue_id, now or datetime.now())
+    return _last_modified(query.one_or_none())
+
+
+#----------------------------------------------------------------------------#
+# Async loaders, for the ASGI read views (asgi.py).
+#
+# Same queries and template rows as the loaders above, executed on the
+# async engine of `bind` (None for the primary). The detail pages run
+# their three queries -- the venue/artist, its past shows and its
+# upcoming shows -- concurrently, each on its own connection.
+#----------------------------------------------------------------------------#
+
+async def _keyset_page_async(query, keys, token, per_page, bind):
+    direction, query = keyset_query(query, keys, token, per_page)
+    return keyset_result(await adb.fetch(query, bind), keys, direction, per_page)
+
+
+async def venue_directory_async(page_token=None, per_page=50, genres=None, match='any', bind=None):
+    page = await _keyset_page_async(_venue_directory_query(genres, match), VENUE_DIRECTORY_KEY, page_token, per_page, bind)
+    areas = [dict(area, venues=list(area['venues'])) for area in _group_areas(page.items)]
+    return page._replace(items=areas)
+
+
+async def artist_listing_async(page_token=None, per_page=50, genres=None, match='any', bind=None):
+    page = await _keyset_page_async(_artist_listing_query(genres, match), ARTIST_LISTING_KEY, page_token, per_page, bind)
+    return page._replace(items=[_artist_row(row) for row in page.items])
+
+
+async def show_listing_async(page_token=None, per_page=50, start=None, end=None, bind=None):
+    page = await _keyset_page_async(_show_listing_query(start, end), SHOW_LISTING_KEY, page_token, per_page, bind)
+    return page._replace(items=_show_rows(page.items))
+
+
+async def _detail_async(model, model_id, shows, now, start, end, bind):
+    """(row, past shows, upcoming shows), fetched concurrently; row is None if missing."""
+    shows = shows.filter(*window_filter(Show.start_time, start, end)).order_by(Show.start_time, Show.id)
+    rows, past, upcoming = await asyncio.gather(
+        adb.fetch(db.select([model.__table__]).where(model.id == model_id), bind),
+        adb.fetch(shows.filter(Show.start_time < now), bind),
+        adb.fetch(shows.filter(Show.start_time >= now), bind),
+    )
+    if not rows:
+        return None, [], []
+    return rows[0], past, upcoming
+
+
+def _detail_rows(shows, row):
+    start_times = format_datetimes([show.start_time for show in shows], SHOW_TIME_FORMAT)
+    return [row(show, start_time) for show, start_time in zip(shows, start_times)]
+
+
+async def venue_detail_async(venue_id, now=None, start=None, end=None, bind=None):
+    if now is None:
+        now = datetime.now()
+
+    venue, past, upcoming = await _detail_async(Venue, venue_id, db.session.query(
+        Show.start_time,
+        Show.artist_id,
+        Artist.name.label('artist_name'),
+        Artist.image_link.label('artist_image_link'),
+    ).join(Artist, Show.artist_id == Artist.id).filter(Show.venue_id == venue_id), now, start, end, bind)
+    if venue is None:
+        return None
+
+    def row(show, start_time):
+        return {
+            "artist_image_link": show.artist_image_link,
+            "start_time": start_time,
+            "artist_id": show.artist_id,
+            "artist_name": show.artist_name,
+        }
+    return _venue_data(venue, _detail_rows(past, row), _detail_rows(upcoming, row))
+
+
+async def artist_detail_async(artist_id, now=None, start=None, end=None, bind=None):
+    if now is None:
+        now = datetime.now()
+
+    artist, past, upcoming = await _detail_async(Artist, artist_id, db.session.query(
+        Show.start_time,
+        Show.venue_id,
+        Venue.name.label('venue_name'),
+        Venue.image_link.label('venue_image_link'),
+    ).join(Venue, Show.venue_id == Venue.id).filter(Show.artist_id == artist_id), now, start, end, bind)
+    if artist is None:
+        return None
+
+    def row(show, start_time):
+        return {
+            "venue_image_link": show.venue_image_link,
+            "start_time": start_time,
+            "venue_id": show.venue_id,
+            "venue_name": show.venue_name,
+        }
+    return _artist_data(artist, _detail_rows(past, row), _detail_rows(upcoming, row))
+
+
+async def _last_modified_async(query, bind):
+    rows = await adb.fetch(query, bind)
+    return _last_modified(rows[0] if rows else None)
+
+
+async def venue_last_modified_async(bind, venue_id, now=None):
+    return await _last_modified_async(_last_modified_query(
+        Venue, venue_id, Show.venue_id, Artist, Show.artist_id, now or datetime.now()), bind)
+
+
+async def artist_last_modified_async(bind, artist_id, now=None):
+    return await _last_modified_async(_last_modified_query(
+        Artist, artist_id, Show.artist_id, Venue, Show.venue_id, now or datetime.now()), bind)
@@ -0,0 +1,213 @@
+import threading
+import time
+
+import jinja2
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+#----------------------------------------------------------------------------#
+# Request metrics.
+#
+# Every request records, per route (the Flask endpoint):
+# - the number of SQL statements and the time spent in them (engine events),
+# - the time spent rendering templates,
+# - the time spent waiting for a pooled connection,
+# - the total latency.
+#
+# They are sent back in a Server-Timing header (db, pool, tpl, total) and
+# kept as Prometheus histograms served at /metrics. Histograms live in the
+# worker process, so with several workers each scrape sees one of them;
+# scrape every worker, or run with one, to see the whole picture.
+#
+# Streamed pages render after the response starts, so their template time
+# is not recorded; their total latency is measured to the end of the stream.
+#----------------------------------------------------------------------------#
+
+DURATION_BUCKETS = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in pairs)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets=DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        for key, (counts, total, count) in series:
+            for bound, n in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{_labels(key, le=bound)}}} {n}')
+            lines.append(f'{self.name}_bucket{{{_labels(key, le="+Inf")}}} {count}')
+            lines.append(f'{self.name}_sum{{{_labels(key)}}} {total}')
+            lines.append(f'{self.name}_count{{{_labels(key)}}} {count}')
+        return '\n'.join(lines)
+
+
+REQUEST_DURATION = Histogram('fyyur_request_duration_seconds', 'Total request latency.')
+DB_QUERIES = Histogram('fyyur_db_queries_per_request', 'SQL statements per request.', COUNT_BUCKETS)
+DB_DURATION = Histogram('fyyur_db_duration_seconds', 'Time spent in SQL statements per request.')
+TEMPLATE_DURATION = Histogram('fyyur_template_render_seconds', 'Time spent rendering templates per request.')
+POOL_WAIT = Histogram('fyyur_db_pool_wait_seconds', 'Time spent waiting for a pooled connection.')
+
+HISTOGRAMS = [REQUEST_DURATION, DB_QUERIES, DB_DURATION, TEMPLATE_DURATION, POOL_WAIT]
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.pool_seconds = 0.0
+
+    def server_timing(self):
+        total = time.perf_counter() - self.started
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.queries} queries"',
+            f'pool;dur={self.pool_seconds * 1000:.2f}',
+            f'tpl;dur={self.template_seconds * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def current():
+    """This request's RequestMetrics, or None outside a (measured) request."""
+    if has_request_context():
+        return g.get('request_metrics')
+    return None
+
+
+def _route():
+    if has_request_context() and request.endpoint:
+        return request.endpoint
+    return 'none'
+
+
+#----------------------------------------------------------------------------#
+# Probes.
+#----------------------------------------------------------------------------#
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _start_query(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _end_query(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('metrics_query_started', None)
+    metrics = current()
+    if metrics is not None and started is not None:
+        metrics.queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+
+
+class _TimedCheckout:
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            metrics = current()
+            if metrics is not None:
+                metrics.pool_seconds += waited
+            POOL_WAIT.observe(waited, route=_route())
+
+
+class TimedAsyncAdaptedQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout waits."""
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    """QueuePool that records checkout waits (including new connections)."""
+
+    asyncio_variant = TimedAsyncAdaptedQueuePool
+
+
+class TimedTemplate(jinja2.Template):
+    def render(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            metrics = current()
+            if metrics is not None:
+                metrics.template_seconds += time.perf_counter() - started
+
+
+#----------------------------------------------------------------------------#
+# Hooks and endpoint.
+#----------------------------------------------------------------------------#
+
+def _start_request():
+    g.request_metrics = RequestMetrics()
+
+
+def _add_server_timing(response):
+    metrics = current()
+    if metrics is not None:
+        response.headers['Server-Timing'] = metrics.server_timing()
+    return response
+
+
+def _record_request(exc):
+    metrics = g.pop('request_metrics', None)
+    if metrics is None:
+        return
+    route = _route()
+    REQUEST_DURATION.observe(time.perf_counter() - metrics.started, route=route)
+    DB_QUERIES.observe(metrics.queries, route=route)
+    DB_DURATION.observe(metrics.db_seconds, route=route)
+    TEMPLATE_DURATION.observe(metrics.template_seconds, route=route)
+
+
+def expose():
+    """All histograms in the Prometheus text format."""
+    return '\n'.join(histogram.expose() for histogram in HISTOGRAMS) + '\n'
+
+
+def metrics_view():
+    return Response(expose(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    app.config.setdefault('METRICS_ENABLED', True)
+    if not app.config['METRICS_ENABLED']:
+        return
+    if not app.config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # A copy: the dict is the config module's, shared by every app.
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': TimedQueuePool, **app.config['SQLALCHEMY_ENGINE_OPTIONS']}
+    app.jinja_env.template_class = TimedTemplate
+    app.before_request(_start_request)
+    app.after_request(_add_server_timing)
+    app.teardown_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,36 @@
+"""Venue and artist name, city and state NOT NULL
+
+Revision ID: 0a5c7e93d2b8
+Revises: f3b8d6a1c924
+Create Date: 2026-10-18 20:52:31.806154
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a5c7e93d2b8'
+down_revision = 'f3b8d6a1c924'
+branch_labels = None
+depends_on = None
+
+# The listings page on these columns (pagination.py), which must not be NULL.
+COLUMNS = {
+    'name': sa.String(),
+    'city': sa.String(length=120),
+    'state': sa.String(length=120),
+}
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        for column, type_ in COLUMNS.items():
+            op.execute(f'UPDATE "{table}" SET {column} = \'\' WHERE {column} IS NULL')
+            op.alter_column(table, column, existing_type=type_, nullable=False)
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        for column, type_ in COLUMNS.items():
+            op.alter_column(table, column, existing_type=type_, nullable=True)
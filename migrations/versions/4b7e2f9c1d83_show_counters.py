@@ -0,0 +1,45 @@
+"""Upcoming/past show counters on Venue and Artist
+
+Revision ID: 4b7e2f9c1d83
+Revises: c3e9a7d25b10
+Create Date: 2026-10-18 14:05:52.630417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7e2f9c1d83'
+down_revision = 'c3e9a7d25b10'
+branch_labels = None
+depends_on = None
+
+PARENTS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    op.create_table('CounterWatermark',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_over_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute('INSERT INTO "CounterWatermark" (id, rolled_over_at) VALUES (1, localtimestamp)')
+
+    for table, key in PARENTS:
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), server_default='0', nullable=False))
+        op.execute(f'''
+            UPDATE "{table}" SET
+              upcoming_shows_count = (SELECT count(*) FROM "Show" s, "CounterWatermark" w
+                                      WHERE s.{key} = "{table}".id AND s.start_time >= w.rolled_over_at),
+              past_shows_count = (SELECT count(*) FROM "Show" s, "CounterWatermark" w
+                                  WHERE s.{key} = "{table}".id AND s.start_time < w.rolled_over_at)
+        ''')
+
+
+def downgrade():
+    for table, key in reversed(PARENTS):
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+    op.drop_table('CounterWatermark')
@@ -0,0 +1,36 @@
+"""Trigram search indexes for venues and artists
+
+Revision ID: 8f2d1c4b7a61
+Revises: 62f3a0894512
+Create Date: 2026-10-18 09:12:44.103522
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8f2d1c4b7a61'
+down_revision = '62f3a0894512'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # array_to_string() is only STABLE, so the document is wrapped in an
+    # IMMUTABLE function that can back an expression index.
+    op.execute('''
+        CREATE OR REPLACE FUNCTION fyyur_search_document(name text, city text, state text, genres text[])
+        RETURNS text LANGUAGE sql IMMUTABLE AS $$
+          SELECT lower(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, '') || ' ' || coalesce(array_to_string(genres, ' '), ''))
+        $$
+    ''')
+    op.execute('CREATE INDEX ix_venue_search_trgm ON "Venue" USING gin (fyyur_search_document(name, city, state, genres) gin_trgm_ops)')
+    op.execute('CREATE INDEX ix_artist_search_trgm ON "Artist" USING gin (fyyur_search_document(name, city, state, genres) gin_trgm_ops)')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS ix_artist_search_trgm')
+    op.execute('DROP INDEX IF EXISTS ix_venue_search_trgm')
+    op.execute('DROP FUNCTION IF EXISTS fyyur_search_document(text, text, text, text[])')
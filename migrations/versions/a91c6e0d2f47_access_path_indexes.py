@@ -0,0 +1,51 @@
+"""Indexes for the show, venue and artist access paths
+
+Revision ID: a91c6e0d2f47
+Revises: 4b7e2f9c1d83
+Create Date: 2026-10-18 15:21:07.884190
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a91c6e0d2f47'
+down_revision = '4b7e2f9c1d83'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_show_venue_start': 'ON "Show" (venue_id, start_time)',
+    'ix_show_artist_start': 'ON "Show" (artist_id, start_time)',
+    'ix_show_start_time': 'ON "Show" (start_time, id)',
+    'ix_venue_area': 'ON "Venue" (city, state, name, id)',
+    'ix_artist_name': 'ON "Artist" (name, id)',
+    'ix_venue_genres': 'ON "Venue" USING gin (genres)',
+    'ix_artist_genres': 'ON "Artist" USING gin (genres)',
+}
+
+
+def _drop_if_invalid(name):
+    # A failed CREATE INDEX CONCURRENTLY leaves an INVALID index behind,
+    # which IF NOT EXISTS would then skip.
+    valid = op.get_bind().execute(sa.text(
+        'SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)'
+    ), {"name": name}).scalar()
+    if valid is False:
+        op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+def upgrade():
+    # CONCURRENTLY builds without blocking writes but cannot run inside a
+    # transaction, hence the autocommit block.
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            _drop_if_invalid(name)
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}')
+
+
+def downgrade():
+    with op.get_context().autocommit_block():
+        for name in reversed(list(INDEXES)):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,34 @@
+"""Add updated_at to Venue, Artist and Show
+
+Revision ID: c3e9a7d25b10
+Revises: 8f2d1c4b7a61
+Create Date: 2026-10-18 12:40:18.271903
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e9a7d25b10'
+down_revision = '8f2d1c4b7a61'
+branch_labels = None
+depends_on = None
+
+TABLES = ('Venue', 'Artist', 'Show')
+
+
+def upgrade():
+    # Existing rows count as updated now, so the first incremental export
+    # after the upgrade is a full one.
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("timezone('utc', now())")))
+        op.alter_column(table, 'updated_at', server_default=None)
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,35 @@
+"""Materialized area directory behind /venues
+
+Revision ID: d5f80b3e6a19
+Revises: a91c6e0d2f47
+Create Date: 2026-10-18 16:48:33.519260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f80b3e6a19'
+down_revision = 'a91c6e0d2f47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('''
+        CREATE MATERIALIZED VIEW area_directory AS
+        SELECT v.id, v.city, v.state, v.name, v.genres,
+               (SELECT count(*) FROM "Show" s
+                WHERE s.venue_id = v.id AND s.start_time >= localtimestamp) AS num_upcoming_shows
+        FROM "Venue" v
+        WITH DATA
+    ''')
+    # REFRESH ... CONCURRENTLY needs a unique index.
+    op.execute('CREATE UNIQUE INDEX ix_area_directory_id ON area_directory (id)')
+    op.execute('CREATE INDEX ix_area_directory_area ON area_directory (city, state, name, id)')
+    op.execute('CREATE INDEX ix_area_directory_genres ON area_directory USING gin (genres)')
+
+
+def downgrade():
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS area_directory')
@@ -0,0 +1,56 @@
+"""Show duration and no double bookings
+
+Revision ID: e7a4c2b9f5d1
+Revises: d5f80b3e6a19
+Create Date: 2026-10-18 18:02:45.117384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a4c2b9f5d1'
+down_revision = 'd5f80b3e6a19'
+branch_labels = None
+depends_on = None
+
+CONSTRAINTS = {
+    'ex_show_venue_overlap': 'venue_id',
+    'ex_show_artist_overlap': 'artist_id',
+}
+
+
+def _range(alias=''):
+    return f"tsrange({alias}start_time, {alias}start_time + {alias}duration_minutes * interval '1 minute')"
+
+
+def _double_bookings(key):
+    return op.get_bind().execute(sa.text(f'''
+        SELECT a.id, b.id FROM "Show" a
+        JOIN "Show" b ON a.{key} = b.{key} AND a.id < b.id AND {_range('a.')} && {_range('b.')}
+        ORDER BY a.id, b.id LIMIT 20
+    ''')).fetchall()
+
+
+def upgrade():
+    op.add_column('Show', sa.Column('duration_minutes', sa.Integer(), nullable=False, server_default='120'))
+    op.create_check_constraint('ck_show_duration', 'Show', 'duration_minutes BETWEEN 1 AND 1440')
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for name, key in CONSTRAINTS.items():
+        # Exclusion constraints cannot be added NOT VALID; existing double
+        # bookings have to be resolved first.
+        pairs = _double_bookings(key)
+        if pairs:
+            raise RuntimeError(
+                f'Shows overlap at the same {key[:-3]} (at the default 120 minutes each), '
+                f'e.g. these (show id, show id) pairs: {pairs}. Move or delete them and upgrade again.'
+            )
+        op.execute(f'ALTER TABLE "Show" ADD CONSTRAINT {name} EXCLUDE USING gist ({key} WITH =, {_range()} WITH &&)')
+
+
+def downgrade():
+    for name in reversed(list(CONSTRAINTS)):
+        op.execute(f'ALTER TABLE "Show" DROP CONSTRAINT IF EXISTS {name}')
+    op.drop_constraint('ck_show_duration', 'Show', type_='check')
+    op.drop_column('Show', 'duration_minutes')
@@ -0,0 +1,39 @@
+"""Area directory reads the upcoming show counters
+
+Revision ID: f3b8d6a1c924
+Revises: e7a4c2b9f5d1
+Create Date: 2026-10-18 20:14:07.402918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d6a1c924'
+down_revision = 'e7a4c2b9f5d1'
+branch_labels = None
+depends_on = None
+
+
+def _create(num_upcoming_shows):
+    op.execute('DROP MATERIALIZED VIEW IF EXISTS area_directory')
+    op.execute(f'''
+        CREATE MATERIALIZED VIEW area_directory AS
+        SELECT v.id, v.city, v.state, v.name, v.genres, {num_upcoming_shows} AS num_upcoming_shows
+        FROM "Venue" v
+        WITH DATA
+    ''')
+    # REFRESH ... CONCURRENTLY needs a unique index.
+    op.execute('CREATE UNIQUE INDEX ix_area_directory_id ON area_directory (id)')
+    op.execute('CREATE INDEX ix_area_directory_area ON area_directory (city, state, name, id)')
+    op.execute('CREATE INDEX ix_area_directory_genres ON area_directory USING gin (genres)')
+
+
+def upgrade():
+    _create('v.upcoming_shows_count')
+
+
+def downgrade():
+    _create('''(SELECT count(*) FROM "Show" s
+                WHERE s.venue_id = v.id AND s.start_time >= localtimestamp)''')
@@ -3,27 +3,44 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.dialects.postgresql import ARRAY
 from datetime import datetime
-from app import app
 
 #----------------------------------------------------------------------------#
 # Models.
+#
+# updated_at (UTC) is maintained on every insert and update, including the
+# Core inserts of the bulk importer; incremental exports filter on it.
+#
+# upcoming_shows_count / past_shows_count are maintained by counters.py
+# relative to CounterWatermark.rolled_over_at, not computed on read.
 #----------------------------------------------------------------------------#
 
+# Genres are a Postgres ARRAY; SQLite (benchmarks, local scratch databases)
+# stores the same list as JSON.
+GenreArray = ARRAY(db.String(120)).with_variant(db.JSON, 'sqlite')
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
+    __table_args__ = (
+        # Directory order, (city, state, name, id); leads with the area.
+        db.Index('ix_venue_area', 'city', 'state', 'name', 'id'),
+        db.Index('ix_venue_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     address = db.Column(db.String(120))
     phone = db.Column(db.String(120))
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
-    genres = db.Column(ARRAY(db.String(120)))
+    genres = db.Column(GenreArray)
     website_link = db.Column(db.String(500))
     seeking_talent = db.Column(db.Boolean, unique=False, default=True)
     seeking_description = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref='venue', lazy=True)
 
     def __repr__(self):
@@ -31,30 +48,59 @@ class Venue(db.Model):
 
 class Artist(db.Model):
     __tablename__ = 'Artist'
+    __table_args__ = (
+        db.Index('ix_artist_name', 'name', 'id'),
+        db.Index('ix_artist_genres', 'genres', postgresql_using='gin'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String)
-    city = db.Column(db.String(120))
-    state = db.Column(db.String(120))
+    name = db.Column(db.String, nullable=False)
+    city = db.Column(db.String(120), nullable=False)
+    state = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(120))
-    genres = db.Column(ARRAY(db.String(120)))
+    genres = db.Column(GenreArray)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
     website_link = db.Column(db.String(500))
     seeking_venue = db.Column(db.Boolean, unique=False, default=True)
     seeking_description = db.Column(db.String(500))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+    upcoming_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_shows_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     shows = db.relationship('Show', backref='artist', lazy=True)
 
     def __repr__(self):
       return f'<Artist {self.name} {self.city} {self.state} {self.phone} {self.image_link} {self.facebook_link} {self.genres} {self.website_link} {self.seeking_venue} {self.seeking_description} {self.shows}>'
 
+# A show runs from start_time for duration_minutes; neither its venue nor its
+# artist may have another show in that time (scheduling.py).
+DEFAULT_SHOW_MINUTES = 120
+MAX_SHOW_MINUTES = 24 * 60
+
 class Show(db.Model):
     __tablename__ = 'Show'
+    __table_args__ = (
+        db.Index('ix_show_venue_start', 'venue_id', 'start_time'),
+        db.Index('ix_show_artist_start', 'artist_id', 'start_time'),
+        db.Index('ix_show_start_time', 'start_time', 'id'),
+        db.CheckConstraint(f'duration_minutes BETWEEN 1 AND {MAX_SHOW_MINUTES}', name='ck_show_duration'),
+    )
   
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
+    duration_minutes = db.Column(db.Integer, nullable=False, default=DEFAULT_SHOW_MINUTES, server_default=str(DEFAULT_SHOW_MINUTES))
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow, index=True)
+
+    def __repr__(self):
+      return f'<Show {self.artist_id} {self.venue_id} {self.start_time}>'
+
+class CounterWatermark(db.Model):
+    __tablename__ = 'CounterWatermark'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_over_at = db.Column(db.DateTime, nullable=False)
 
     def __repr__(self):
-      return f'<Show {self.artist_id} {self.venue_id} {self.start_time}>'
\ No newline at end of file
+      return f'<CounterWatermark {self.rolled_over_at}>'
@@ -0,0 +1,92 @@
+import base64
+import binascii
+import json
+from collections import namedtuple
+from datetime import datetime
+
+from db import db
+
+#----------------------------------------------------------------------------#
+# Keyset pagination.
+#
+# A page is addressed by the sort key of the row it starts after (or, going
+# backwards, before) instead of an OFFSET, so every page is one index range
+# scan however deep into the listing it is. The key always ends with a
+# unique column (the id) so the order is total and page tokens are stable
+# while rows are inserted. Key columns must be NOT NULL: a NULL compares as
+# unknown, so its row would drop out of every page after the first.
+#----------------------------------------------------------------------------#
+
+Page = namedtuple('Page', ['items', 'next_token', 'prev_token'])
+
+
+def encode_token(values, direction='next'):
+    payload = {
+        "d": direction,
+        "k": [value.isoformat() if isinstance(value, datetime) else value for value in values],
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':')).encode()).decode()
+
+
+def decode_token(token, keys):
+    """(direction, key values) for a page token, or (None, None) if unusable."""
+    if not token:
+        return None, None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        direction, values = payload['d'], payload['k']
+        if direction not in ('next', 'prev') or len(values) != len(keys):
+            return None, None
+        values = [
+            datetime.fromisoformat(value) if isinstance(key.type, db.DateTime) and value is not None else value
+            for key, value in zip(keys, values)
+        ]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        return None, None
+    return direction, values
+
+
+def keyset_query(query, keys, token=None, per_page=50):
+    """(direction, query) for one page: `query` filtered past the token,
+    ordered on `keys` and limited to per_page + 1 rows."""
+    direction, values = decode_token(token, keys)
+
+    if direction == 'prev':
+        query = query.filter(db.tuple_(*keys) < db.tuple_(*values))
+        query = query.order_by(*(key.desc() for key in keys))
+    else:
+        if direction == 'next':
+            query = query.filter(db.tuple_(*keys) > db.tuple_(*values))
+        query = query.order_by(*keys)
+    return direction, query.limit(per_page + 1)
+
+
+def keyset_result(rows, keys, direction, per_page=50):
+    """The Page for the rows fetched with keyset_query()."""
+    rows = list(rows)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'prev':
+        rows.reverse()
+
+    def key_of(row):
+        return [getattr(row, key.key) for key in keys]
+
+    next_token = prev_token = None
+    if rows:
+        if has_more or direction == 'prev':
+            next_token = encode_token(key_of(rows[-1]), 'next')
+        if direction == 'next' or (direction == 'prev' and has_more):
+            prev_token = encode_token(key_of(rows[0]), 'prev')
+    return Page(rows, next_token, prev_token)
+
+
+def keyset_page(query, keys, token=None, per_page=50):
+    """Fetch one page of `query` ordered by `keys`, ascending.
+
+    `keys` are the selected columns the listing is sorted on; each row must
+    expose them as attributes under the column's key. Returns a Page whose
+    tokens are None when there is nothing further in that direction.
+    """
+    direction, query = keyset_query(query, keys, token, per_page)
+    return keyset_result(query.all(), keys, direction, per_page)
@@ -0,0 +1,217 @@
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+#----------------------------------------------------------------------------#
+# Query budgets, as a pytest plugin.
+#
+#   python -m pytest
+#
+# conftest.py registers the plugin and pytest.ini turns it on; outside this
+# directory, use `-p query_budget --query-budgets`.
+#
+# Every endpoint of the app has a budget: the most SQL statements one
+# request to it may send. The plugin seeds a scratch SQLite catalog at two
+# sizes (benchmarks/datagen.py), sends each endpoint's requests from
+# benchmarks/bench_load.py through the Flask test client at both, and adds
+# one test per endpoint that fails if
+#
+# - the statement count grows with the catalog (an N+1 query), or
+# - it exceeds the endpoint's budget, or
+# - the endpoint has no budget.
+#
+# Other tests can use the `count_queries` fixture, a context manager that
+# counts the statements sent by the current thread:
+#
+#   def test_venue_page(client, count_queries):
+#       with count_queries() as queries:
+#           client.get('/venues/1')
+#       assert queries.count <= 2
+#
+# The page cache and area directory refreshes are off while measuring, so
+# counts are the same from run to run.
+#----------------------------------------------------------------------------#
+
+BUDGETS = {
+    "index": 0,
+    "static": 0,
+    "asset": 0,
+    "venues.venues": 4,
+    "artists.artists": 4,
+    "shows.shows": 1,
+    "shows.calendar": 1,
+    # The conditional GET validator, then the page (the validator alone on a 304).
+    "venues.show_venue": 2,
+    "artists.show_artist": 2,
+    "venues.search_venues": 2,
+    "artists.search_artists": 2,
+    "venues.create_venue_form": 0,
+    "artists.create_artist_form": 0,
+    "shows.create_shows": 0,
+    "venues.edit_venue": 1,
+    "artists.edit_artist": 1,
+    "venues.create_venue_submission": 1,
+    "artists.create_artist_submission": 1,
+    # Conflict check, INSERT, counter watermark, venue and artist counters.
+    "shows.create_show_submission": 5,
+    "venues.edit_venue_submission": 3,
+    "artists.edit_artist_submission": 3,
+    "venues.delete_venue": 1,
+    "export_catalog": 1,
+    "import_catalog": 2,
+    "metrics": 0,
+    "cache_stats": 0,
+    "pool_stats": 0,
+}
+
+# (venues, artists, shows) for the small and large catalog.
+SIZES = [(20, 40, 200), (200, 400, 4000)]
+
+
+class QueryCounter:
+    """Counts the statements sent by one thread."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+        self.thread = threading.get_ident()
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if threading.get_ident() == self.thread:
+            self.count += 1
+            self.statements.append(statement)
+
+
+@contextmanager
+def counting_queries():
+    counter = QueryCounter()
+    event.listen(Engine, 'before_cursor_execute', counter)
+    try:
+        yield counter
+    finally:
+        event.remove(Engine, 'before_cursor_execute', counter)
+
+
+@contextmanager
+def scratch_app(path):
+    """The app bound to a fresh SQLite database at `path`, measuring setup."""
+    from wsgi import app
+    from cache import cache
+
+    overrides = {
+        "SQLALCHEMY_DATABASE_URI": f'sqlite:///{path}',
+        "SQLALCHEMY_BINDS": {},
+        "AREA_DIRECTORY_REFRESH": 'off',
+        "SQLALCHEMY_ENGINE_OPTIONS": {},
+        "PROPAGATE_EXCEPTIONS": False,
+        "ADMIN_TOKEN": 'query-budget',
+    }
+    saved = {key: app.config.get(key) for key in overrides}
+    cache_enabled, cache.enabled = cache.enabled, False
+    app.config.update(overrides)
+    try:
+        yield app
+    finally:
+        app.config.update(saved)
+        cache.enabled = cache_enabled
+
+
+def measure(app, size):
+    """{endpoint: most statements any of its requests sends} on a catalog of `size`."""
+    from benchmarks.bench_load import SCENARIOS, auth_headers, requests_for
+    from benchmarks.datagen import generate
+    from db import db
+
+    venues, artists, shows = size
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        generate(venues, artists, shows)
+        db.session.remove()
+
+    client = app.test_client()
+    counts = {}
+    sizes = {"venues": venues, "artists": artists}
+    for endpoint, variants in SCENARIOS.items():
+        # One warm-up request, then each variant once; the worst one counts.
+        requests = list(requests_for(endpoint, 1 + len(variants), sizes))
+        counted = []
+        for method, path, data in requests:
+            options = {"content_type": 'text/csv'} if isinstance(data, str) else {}
+            with counting_queries() as counter:
+                client.open(path, method=method, data=data, headers=auth_headers(), **options).close()
+            counted.append(counter.count)
+        counts[endpoint] = max(counted[1:])
+    return counts
+
+
+#----------------------------------------------------------------------------#
+# Plugin hooks.
+#----------------------------------------------------------------------------#
+
+def pytest_addoption(parser):
+    parser.addoption('--query-budgets', action='store_true',
+                     help='check every endpoint against its SQL statement budget')
+
+
+class QueryBudgetItem(pytest.Item):
+    def __init__(self, *, endpoint, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+
+    def runtest(self):
+        counts = self.session.config.stash[MEASUREMENTS]
+        small, large = (sized[self.endpoint] for sized in counts)
+        budget = BUDGETS.get(self.endpoint)
+        if budget is None:
+            raise QueryBudgetError(f'{self.endpoint} has no query budget (it sends {large} statements)')
+        if large > small:
+            raise QueryBudgetError(f'{self.endpoint} sends {small} statements for {SIZES[0]} '
+                                   f'and {large} for {SIZES[1]}: it grows with the data')
+        if large > budget:
+            raise QueryBudgetError(f'{self.endpoint} sends {large} statements, over its budget of {budget}')
+
+    def repr_failure(self, excinfo):
+        if isinstance(excinfo.value, QueryBudgetError):
+            return str(excinfo.value)
+        return super().repr_failure(excinfo)
+
+    def reportinfo(self):
+        return self.path, None, f'query budget: {self.endpoint}'
+
+
+class QueryBudgetError(AssertionError):
+    pass
+
+
+MEASUREMENTS = pytest.StashKey()
+
+
+def pytest_collection_modifyitems(session, config, items):
+    if not config.getoption('--query-budgets'):
+        return
+    from benchmarks.bench_load import check_coverage, SCENARIOS
+
+    check_coverage()
+    for endpoint in SCENARIOS:
+        items.append(QueryBudgetItem.from_parent(session, name=f'query_budget[{endpoint}]', endpoint=endpoint))
+
+
+@pytest.hookimpl(tryfirst=True)
+def pytest_runtestloop(session):
+    if not session.config.getoption('--query-budgets'):
+        return None
+    with tempfile.TemporaryDirectory() as tmp, scratch_app(Path(tmp) / 'budget.db') as app:
+        session.config.stash[MEASUREMENTS] = [measure(app, size) for size in SIZES]
+    return None
+
+
+@pytest.fixture
+def count_queries():
+    return counting_queries
@@ -0,0 +1,88 @@
+import random
+import time
+from functools import wraps
+
+from flask import current_app, g, has_app_context, has_request_context, session
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+
+#----------------------------------------------------------------------------#
+# Read/write splitting.
+#
+# Replicas are configured as SQLALCHEMY_BINDS named replica_0, replica_1...
+# Views decorated with @use_replica send their queries to one replica,
+# picked once per request; everything else, and anything that flushes,
+# goes to the primary.
+#
+# Read-your-writes: a request that commits pins the client to the primary
+# for READ_YOUR_WRITES_SECONDS (recorded in the Flask session), so the
+# redirect after a submission reads what it just wrote even while the
+# replicas lag.
+#----------------------------------------------------------------------------#
+
+REPLICA_PREFIX = 'replica_'
+PRIMARY_UNTIL = 'db_primary_until'
+
+
+def replica_binds(app):
+    return sorted(key for key in (app.config.get('SQLALCHEMY_BINDS') or {}) if key.startswith(REPLICA_PREFIX))
+
+
+class RoutingSession(SignallingSession):
+    def __init__(self, db, **options):
+        self._db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        replica = getattr(g, 'db_replica', None) if has_app_context() else None
+        if replica is not None and not (self._flushing or self.new or self.dirty or self.deleted):
+            return self._db.get_engine(self.app, bind=replica)
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if has_request_context():
+        g.db_wrote = True
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def init_app(self, app):
+        super().init_app(app)
+        app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+        app.after_request(_pin_writer_to_primary)
+        app.teardown_request(_forget_route)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+def _pin_writer_to_primary(response):
+    if g.get('db_wrote'):
+        session[PRIMARY_UNTIL] = time.time() + current_app.config['READ_YOUR_WRITES_SECONDS']
+    return response
+
+
+def _forget_route(exc):
+    # Streamed responses keep the request (and its replica) until they finish.
+    g.pop('db_replica', None)
+    g.pop('db_wrote', None)
+
+
+def pick_replica():
+    """The replica bind this request may read from, or None for the primary."""
+    replicas = replica_binds(current_app)
+    if replicas and session.get(PRIMARY_UNTIL, 0) < time.time():
+        return random.choice(replicas)
+    return None
+
+
+def use_replica(view):
+    """Run a read-only view against a read replica, if any are configured."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        replica = pick_replica()
+        if replica is not None:
+            g.db_replica = replica
+        return view(*args, **kwargs)
+    return wrapper
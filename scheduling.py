@@ -0,0 +1,224 @@
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import DDL, event
+from sqlalchemy.orm import Session
+
+from db import db
+from models import Show, DEFAULT_SHOW_MINUTES, MAX_SHOW_MINUTES
+from counters import parse_start_time
+
+#----------------------------------------------------------------------------#
+# Scheduling conflicts.
+#
+# A show occupies its venue and its artist from start_time for
+# duration_minutes, and neither may be booked twice at once. Back-to-back
+# shows (one ends when the next starts) are fine.
+#
+# Postgres: exclusion constraints over (venue_id, time range) and
+#   (artist_id, time range), on btree_gist indexes, reject a double
+#   booking even from concurrent transactions.
+# Everywhere: every flush that adds or moves shows is checked first, so a
+#   conflict is reported as a ScheduleConflict naming the show it clashes
+#   with rather than as a database error. On SQLite this check is the
+#   only enforcement.
+#
+# find_conflicts() checks any number of shows -- a form submission, an
+# import batch, a whole tour -- with one query: the existing shows of their
+# venues and artists in the batch's time span. Those are indexed in memory
+# (IntervalIndex) and the batch is swept in start order, O(n log n) for n
+# shows instead of a query per show. Within a batch the earlier show wins.
+#
+#   flask schedule conflicts     # lists double bookings already stored
+#----------------------------------------------------------------------------#
+
+# Whatever a show is checked against started at most this long before it.
+MAX_DURATION = timedelta(minutes=MAX_SHOW_MINUTES)
+
+KINDS = ('venue', 'artist')
+
+# `show` is what was passed in (a Show, a dict of its values or a row).
+Booking = namedtuple('Booking', 'show id venue_id artist_id start end')
+Conflict = namedtuple('Conflict', 'booking kind other')
+
+POSTGRES_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS btree_gist',
+] + [
+    f'ALTER TABLE "Show" ADD CONSTRAINT ex_show_{kind}_overlap EXCLUDE USING gist '
+    f"({kind}_id WITH =, tsrange(start_time, start_time + duration_minutes * interval '1 minute') WITH &&)"
+    for kind in KINDS
+]
+
+for _statement in POSTGRES_DDL:
+    event.listen(Show.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+
+
+class ScheduleConflict(Exception):
+    def __init__(self, conflicts):
+        self.conflicts = conflicts
+        super().__init__(' '.join(describe(conflict) for conflict in conflicts))
+
+
+def describe(conflict):
+    other = conflict.other
+    booked = f'show {other.id}' if other.id is not None else 'another new show'
+    return (f'{conflict.kind.capitalize()} {getattr(other, conflict.kind + "_id")} is already booked '
+            f'from {other.start:%Y-%m-%d %H:%M} to {other.end:%Y-%m-%d %H:%M} ({booked}).')
+
+
+def _value(show, key):
+    return show.get(key) if isinstance(show, dict) else getattr(show, key, None)
+
+
+def as_booking(show):
+    """The Booking for a Show, a dict of its column values or a row with them."""
+    start = parse_start_time(_value(show, 'start_time'))
+    minutes = int(_value(show, 'duration_minutes') or DEFAULT_SHOW_MINUTES)
+    return Booking(
+        show, _value(show, 'id'), int(_value(show, 'venue_id')), int(_value(show, 'artist_id')),
+        start, start + timedelta(minutes=minutes),
+    )
+
+
+class IntervalIndex:
+    """Which of a fixed set of bookings overlaps a time range, in O(log n).
+
+    Bookings are sorted by start with the running latest end (and whose it
+    is): those starting before a range ends overlap it if the latest of
+    their ends is after its start.
+    """
+
+    def __init__(self, bookings):
+        bookings = sorted(bookings, key=lambda booking: booking.start)
+        self.starts = [booking.start for booking in bookings]
+        self.latest = []
+        for booking in bookings:
+            if not self.latest or booking.end > self.latest[-1].end:
+                self.latest.append(booking)
+            else:
+                self.latest.append(self.latest[-1])
+
+    def overlapping(self, start, end):
+        """A booking overlapping [start, end), or None."""
+        before = bisect_left(self.starts, end)
+        if before and self.latest[before - 1].end > start:
+            return self.latest[before - 1]
+        return None
+
+
+def _indexes(bookings):
+    """{(kind, id): IntervalIndex} of `bookings` by venue and by artist."""
+    grouped = {}
+    for booking in bookings:
+        for kind in KINDS:
+            grouped.setdefault((kind, getattr(booking, kind + '_id')), []).append(booking)
+    return {key: IntervalIndex(group) for key, group in grouped.items()}
+
+
+def _sweep(bookings, existing=None):
+    """Conflicts of `bookings` with `existing` and with each other, earlier start first."""
+    existing = existing or {}
+    # (kind, id) -> the accepted booking that ends last. Accepted bookings
+    # of one venue or artist never overlap, so it is also the one that
+    # started last, and a later booking overlaps one of them only if it
+    # overlaps that one.
+    last = {}
+    conflicts = []
+    for booking in sorted(bookings, key=lambda booking: booking.start):
+        keys = [(kind, getattr(booking, kind + '_id')) for kind in KINDS]
+        conflict = None
+        for key in keys:
+            other = existing[key].overlapping(booking.start, booking.end) if key in existing else None
+            if other is None and key in last and last[key].end > booking.start:
+                other = last[key]
+            if other is not None:
+                conflict = Conflict(booking, key[0], other)
+                break
+        if conflict is not None:
+            conflicts.append(conflict)
+        else:
+            for key in keys:
+                last[key] = booking
+    return conflicts
+
+
+def _stored_bookings(bookings, connection):
+    """The stored shows the batch could clash with, in one indexed query."""
+    table = Show.__table__
+    ids = {booking.id for booking in bookings if booking.id is not None}
+    query = db.select([
+        table.c.id, table.c.venue_id, table.c.artist_id, table.c.start_time, table.c.duration_minutes,
+    ]).where(db.and_(
+        db.or_(
+            table.c.venue_id.in_({booking.venue_id for booking in bookings}),
+            table.c.artist_id.in_({booking.artist_id for booking in bookings}),
+        ),
+        table.c.start_time > min(booking.start for booking in bookings) - MAX_DURATION,
+        table.c.start_time < max(booking.end for booking in bookings),
+    ))
+    if ids:
+        # Shows being moved are checked at their new times, not their old ones.
+        query = query.where(table.c.id.notin_(ids))
+    return [as_booking(row) for row in connection.execute(query)]
+
+
+def find_conflicts(shows, connection=None):
+    """[Conflict] for the shows that would double-book a venue or an artist.
+
+    `shows` are Show objects or dicts of their values, new or moved; each
+    is checked against the stored shows and the others in `shows`. One
+    query, on `connection` (the session's by default).
+    """
+    bookings = [as_booking(show) for show in shows]
+    if not bookings:
+        return []
+    if connection is None:
+        connection = db.session.connection()
+    return _sweep(bookings, _indexes(_stored_bookings(bookings, connection)))
+
+
+def check(shows, connection=None):
+    """Raise ScheduleConflict if any of `shows` would double-book."""
+    conflicts = find_conflicts(shows, connection)
+    if conflicts:
+        raise ScheduleConflict(conflicts)
+
+
+SCHEDULE_COLUMNS = ('venue_id', 'artist_id', 'start_time', 'duration_minutes')
+
+
+@event.listens_for(Session, 'before_flush')
+def _check_flushed_shows(session, flush_context, instances):
+    shows = [show for show in session.new if isinstance(show, Show)]
+    for show in session.dirty:
+        if isinstance(show, Show) and any(db.inspect(show).attrs[key].history.has_changes() for key in SCHEDULE_COLUMNS):
+            shows.append(show)
+    if shows:
+        check(shows, session.connection())
+
+
+schedule_cli = AppGroup('schedule', help='Check the show schedule.')
+
+
+@schedule_cli.command('conflicts')
+@click.option('--batch-size', default=10000, show_default=True)
+def conflicts_command(batch_size):
+    """List stored shows that overlap an earlier show at their venue or with their artist."""
+    table = Show.__table__
+    connection = db.session.connection().execution_options(stream_results=True, max_row_buffer=batch_size)
+    rows = connection.execute(
+        db.select([table.c.id, table.c.venue_id, table.c.artist_id, table.c.start_time, table.c.duration_minutes])
+        .order_by(table.c.start_time)
+    )
+    conflicts = _sweep(as_booking(row) for row in rows)
+    for conflict in conflicts:
+        show = conflict.booking
+        click.echo(f'show {show.id} ({show.start:%Y-%m-%d %H:%M}, {show.end - show.start}): {describe(conflict)}')
+    click.echo(f'{len(conflicts)} conflicting shows')
+
+
+def init_app(app):
+    app.cli.add_command(schedule_cli)
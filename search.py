@@ -0,0 +1,248 @@
+import asyncio
+
+from sqlalchemy import DDL, event, text
+
+from db import db
+from models import Venue, Artist
+from pagination import keyset_page, keyset_query, keyset_result
+from genres import genre_filter, genre_facets_query, facet_list, genre_facets
+from async_db import adb
+
+#----------------------------------------------------------------------------#
+# Search.
+#
+# Venues and artists are matched on name, city, state and genres, as a
+# case-insensitive partial match like the old `name.ilike('%term%')`.
+#
+# Postgres: a pg_trgm GIN index over fyyur_search_document(...) serves the
+#   ILIKE, and word_similarity() ranks the hits.
+# SQLite:   an FTS5 table with the trigram tokenizer, kept in sync by
+#   triggers, serves MATCH and bm25() ranks the hits.
+#
+# Both backends return the page of hits, the total hit count and each hit's
+# upcoming show count from one statement, paged by offset or keyset.
+#----------------------------------------------------------------------------#
+
+SEARCH_COLUMNS = ('name', 'city', 'state', 'genres')
+
+POSTGRES_SEARCH_DOCUMENT = DDL('''
+CREATE OR REPLACE FUNCTION fyyur_search_document(name text, city text, state text, genres text[])
+RETURNS text LANGUAGE sql IMMUTABLE AS $$
+  SELECT lower(coalesce(name, '') || ' ' || coalesce(city, '') || ' ' || coalesce(state, '') || ' ' || coalesce(array_to_string(genres, ' '), ''))
+$$
+''')
+
+
+def _fts_table(model):
+    return f'{model.__tablename__.lower()}_search'
+
+
+def _register_search_index(model):
+    table = model.__table__
+    fts = _fts_table(model)
+    columns = ', '.join(SEARCH_COLUMNS)
+    new_values = ', '.join(f'new.{column}' for column in SEARCH_COLUMNS)
+    old_values = ', '.join(f'old.{column}' for column in SEARCH_COLUMNS)
+
+    for statement in [
+        'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+        POSTGRES_SEARCH_DOCUMENT,
+        f'CREATE INDEX IF NOT EXISTS ix_{fts}_trgm ON "{table.name}" '
+        f'USING gin (fyyur_search_document({columns}) gin_trgm_ops)',
+    ]:
+        if not isinstance(statement, DDL):
+            statement = DDL(statement)
+        event.listen(table, 'after_create', statement.execute_if(dialect='postgresql'))
+
+    for statement in [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({columns}, "
+        f"content='{table.name}', content_rowid='id', tokenize='trigram')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON "{table.name}" BEGIN '
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON "{table.name}" BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON "{table.name}" BEGIN '
+        f"INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f'INSERT INTO {fts}(rowid, {columns}) VALUES (new.id, {new_values}); END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+    event.listen(table, 'before_drop', DDL(f'DROP TABLE IF EXISTS {fts}').execute_if(dialect='sqlite'))
+
+
+_register_search_index(Venue)
+_register_search_index(Artist)
+
+
+def _escape_like(term):
+    return term.replace('!', '!!').replace('%', '!%').replace('_', '!_')
+
+
+def _postgres_hits(model, term):
+    document = db.func.fyyur_search_document(*(getattr(model, column) for column in SEARCH_COLUMNS))
+    needle = term.lower()
+
+    return db.session.query(
+        model.id.label('id'),
+        model.name.label('name'),
+        (-db.func.word_similarity(needle, document)).label('rank'),
+    ).filter(
+        document.like(f'%{_escape_like(needle)}%', escape='!')
+    ).subquery('hits')
+
+
+def _sqlite_hits(model, term):
+    fts = _fts_table(model)
+
+    # The trigram tokenizer can only MATCH terms of three characters or more;
+    # shorter terms fall back to LIKE over the same columns.
+    if len(term) >= 3:
+        match = f'{fts} MATCH :query'
+        params = {"query": '"' + term.replace('"', '""') + '"'}
+        rank = 'f.rank'
+    else:
+        match = ' OR '.join(f"f.{column} LIKE :pattern ESCAPE '!'" for column in SEARCH_COLUMNS)
+        params = {"pattern": f'%{_escape_like(term)}%'}
+        rank = '0.0'
+
+    return text(f'''
+        SELECT e.id AS id, e.name AS name, {rank} AS rank
+        FROM {fts} f JOIN "{model.__tablename__}" e ON e.id = f.rowid
+        WHERE {match}
+    ''').bindparams(**params).columns(
+        id=db.Integer, name=db.String, rank=db.Float
+    ).subquery('hits')
+
+
+def _search_query(model, term, genres=None, match='any'):
+    """Hits for `term` with their rank, total hit count and upcoming shows.
+
+    Rank sorts ascending (best first) on both backends, so callers order or
+    paginate on (rank, name, id).
+    """
+    term = (term or '').strip()
+
+    if db.engine.dialect.name == 'sqlite':
+        hits = _sqlite_hits(model, term)
+    else:
+        hits = _postgres_hits(model, term)
+
+    results = db.session.query(
+        hits.c.id,
+        hits.c.name,
+        hits.c.rank,
+        model.upcoming_shows_count.label('num_upcoming_shows'),
+        # Counted after the genre filter but before paging, which applies
+        # to the outer query.
+        db.func.count().over().label('total'),
+    ).join(
+        model, model.id == hits.c.id
+    )
+    criterion = genre_filter(model, genres, match)
+    if criterion is not None:
+        results = results.filter(criterion)
+    results = results.subquery('results')
+
+    query = db.session.query(
+        results.c.id,
+        results.c.name,
+        results.c.rank,
+        results.c.total,
+        results.c.num_upcoming_shows,
+    )
+    return query, [results.c.rank, results.c.name, results.c.id]
+
+
+def _results(rows):
+    return {
+        "count": rows[0].total if rows else 0,
+        "data": [{
+            "id": row.id,
+            "name": row.name,
+            "num_upcoming_shows": row.num_upcoming_shows,
+        } for row in rows],
+    }
+
+
+def _search(model, term, limit=None, offset=0, genres=None, match='any'):
+    query, keys = _search_query(model, term, genres, match)
+    query = query.order_by(*keys)
+    if limit is not None:
+        query = query.limit(limit)
+    return _results(query.offset(offset).all())
+
+
+def _search_page(model, term, page_token=None, per_page=50, genres=None, match='any'):
+    query, keys = _search_query(model, term, genres, match)
+    page = keyset_page(query, keys, page_token, per_page)
+    return page._replace(items=_results(page.items))
+
+
+def find_venues(term, limit=None, offset=0, genres=None, match='any'):
+    """Ranked venue hits for `term`, in the shape search_venues.html expects."""
+    return _search(Venue, term, limit, offset, genres, match)
+
+
+def find_artists(term, limit=None, offset=0, genres=None, match='any'):
+    """Ranked artist hits for `term`, in the shape search_artists.html expects."""
+    return _search(Artist, term, limit, offset, genres, match)
+
+
+def venue_search_page(term, page_token=None, per_page=50, genres=None, match='any'):
+    """Like find_venues(), but one keyset page of hits."""
+    return _search_page(Venue, term, page_token, per_page, genres, match)
+
+
+def artist_search_page(term, page_token=None, per_page=50, genres=None, match='any'):
+    """Like find_artists(), but one keyset page of hits."""
+    return _search_page(Artist, term, page_token, per_page, genres, match)
+
+
+def _search_facets(model, term, genres=None, match='any'):
+    query, keys = _search_query(model, term, genres, match)
+    hits = query.subquery()
+    return genre_facets(model, model.id.in_(db.select([hits.c.id])), selected=genres or ())
+
+
+def venue_search_facets(term, genres=None, match='any'):
+    """Genre facet counts over all venue hits for `term`."""
+    return _search_facets(Venue, term, genres, match)
+
+
+def artist_search_facets(term, genres=None, match='any'):
+    """Genre facet counts over all artist hits for `term`."""
+    return _search_facets(Artist, term, genres, match)
+
+
+#----------------------------------------------------------------------------#
+# Async search, for the ASGI read views (asgi.py).
+#----------------------------------------------------------------------------#
+
+async def _search_page_async(model, term, page_token=None, per_page=50, genres=None, match='any', bind=None):
+    query, keys = _search_query(model, term, genres, match)
+    direction, query = keyset_query(query, keys, page_token, per_page)
+    page = keyset_result(await adb.fetch(query, bind), keys, direction, per_page)
+    return page._replace(items=_results(page.items))
+
+
+async def _search_facets_async(model, term, genres=None, match='any', bind=None):
+    query, keys = _search_query(model, term, genres, match)
+    hits = query.subquery()
+    rows = await adb.fetch(genre_facets_query(model, model.id.in_(db.select([hits.c.id]))), bind)
+    return facet_list(rows, genres or ())
+
+
+async def venue_search_async(term, page_token=None, per_page=50, genres=None, match='any', bind=None):
+    """(venue_search_page(), venue_search_facets()), queried concurrently."""
+    return await asyncio.gather(
+        _search_page_async(Venue, term, page_token, per_page, genres, match, bind),
+        _search_facets_async(Venue, term, genres, match, bind),
+    )
+
+
+async def artist_search_async(term, page_token=None, per_page=50, genres=None, match='any', bind=None):
+    """(artist_search_page(), artist_search_facets()), queried concurrently."""
+    return await asyncio.gather(
+        _search_page_async(Artist, term, page_token, per_page, genres, match, bind),
+        _search_facets_async(Artist, term, genres, match, bind),
+    )
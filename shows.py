@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from flask import Blueprint, current_app, render_template, request, flash
+
+from db import db
+from models import Show, DEFAULT_SHOW_MINUTES
+from scheduling import ScheduleConflict
+from loaders import show_listing, stream_shows, show_calendar
+from streaming import wants_stream, stream_page
+from cache import cache
+from routing import use_replica
+from windows import requested_window, window_args, requested_month, month_bounds, day_window
+
+bp = Blueprint('shows', __name__)
+
+#  Shows
+#  ----------------------------------------------------------------
+
+@bp.route('/shows')
+@cache.cached('venues', 'artists', 'shows')
+@use_replica
+def shows():
+  # displays list of shows at /shows, or those in ?from=...&to=...
+  start, end = requested_window()
+  window = dict(start=start, end=end, window_args=window_args(start, end))
+  if wants_stream():
+    shows = stream_shows(current_app.config['STREAM_BATCH_SIZE'], start, end)
+    return stream_page('pages/shows.html', shows=shows, page=None, **window)
+
+  page = show_listing(request.args.get('page'), current_app.config['PAGE_SIZE'], start, end)
+  return render_template('pages/shows.html', shows=page.items, page=page, **window)
+
+@bp.route('/shows/calendar')
+@cache.cached('venues', 'artists', 'shows')
+@use_replica
+def calendar():
+  # shows per day for ?month=YYYY-MM, optionally of one ?venue_id= or ?artist_id=
+  first = requested_month()
+  venue_id = request.args.get('venue_id', type=int)
+  artist_id = request.args.get('artist_id', type=int)
+  weeks = show_calendar(first, venue_id, artist_id)
+  previous, following = (first - timedelta(days=1)).replace(day=1), month_bounds(first)[1]
+  return render_template('pages/calendar.html', weeks=weeks, month=first, previous=previous, following=following,
+    venue_id=venue_id, artist_id=artist_id, day_window=day_window)
+
+@bp.route('/shows/create')
+def create_shows():
+  from forms import ShowForm
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@bp.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  from forms import ShowForm
+  form = ShowForm(request.form, meta={"csrf": False})
+  if not form.validate():
+    for name, errors in form.errors.items():
+      flash(getattr(form, name).label.text + ': ' + ' '.join(errors))
+    return render_template('forms/new_show.html', form=form)
+
+  error = False
+  try:
+
+    thisShow = Show(
+      artist_id=form.artist_id.data,
+      venue_id=form.venue_id.data,
+      start_time=form.start_time.data,
+      duration_minutes=form.duration_minutes.data or DEFAULT_SHOW_MINUTES
+    )
+    db.session.add(thisShow)
+    db.session.commit()
+    cache.bump('shows')
+    flash('Show was successfully listed!')
+  except ScheduleConflict as conflict:
+    # Checked on flush (scheduling.py): the venue or artist is already booked then.
+    error = True
+    db.session.rollback()
+    flash('Show could not be listed. ' + str(conflict))
+  except:
+    error = True
+    db.session.rollback()
+    flash('An error occurred. Show could not be listed.')
+  finally:
+    db.session.close()
+
+  return render_template('pages/home.html')
@@ -0,0 +1,205 @@
+import json
+import logging
+import queue
+import random
+import threading
+import time
+from datetime import datetime
+from logging import FileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import NullPool
+
+#----------------------------------------------------------------------------#
+# Slow-query log.
+#
+# Statements that take longer than SLOW_QUERY_MS are written to
+# SLOW_QUERY_LOG (next to error.log) as one JSON object per line:
+#
+#   {"at": ..., "duration_ms": ..., "statement": ..., "parameters": ...,
+#    "route": "show_venue", "method": "GET", "path": "/venues/7",
+#    "database": "postgresql://fyyur@db/fyyur", "plan": [...]}
+#
+# The request only pays for two clock reads per statement. Slow ones are
+# sampled (SLOW_QUERY_SAMPLE_RATE), rate limited (SLOW_QUERY_MAX_PER_MINUTE)
+# and handed to a background thread, which writes the line and, with
+# SLOW_QUERY_EXPLAIN, captures the plan on its own connection:
+#
+#   plan     EXPLAIN (FORMAT JSON) / EXPLAIN QUERY PLAN on SQLite
+#   analyze  EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON); this runs the
+#            statement again, so only SELECTs are explained and at most
+#            SLOW_QUERY_EXPLAIN_PER_MINUTE of them
+#
+# When the queue is full, records are dropped rather than slowing requests.
+#----------------------------------------------------------------------------#
+
+EXPLAIN_MODES = ('off', 'plan', 'analyze')
+MAX_PARAMETER_LENGTH = 200
+MAX_PARAMETER_ROWS = 5
+QUEUE_SIZE = 256
+
+logger = logging.getLogger('fyyur.slow_queries')
+
+
+class RateLimiter:
+    """A token bucket allowing `per_minute` events, in bursts of up to that many."""
+
+    def __init__(self, per_minute):
+        self.rate = per_minute / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+def _jsonable(value):
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): _jsonable(item) for key, item in value.items()}
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value.isoformat() if isinstance(value, datetime) else str(value)
+    return text if len(text) <= MAX_PARAMETER_LENGTH else text[:MAX_PARAMETER_LENGTH] + '...'
+
+
+def _parameters(parameters, executemany):
+    if executemany:
+        return {"rows": len(parameters), "first": _jsonable(list(parameters[:MAX_PARAMETER_ROWS]))}
+    return _jsonable(parameters)
+
+
+def _origin():
+    if not has_request_context():
+        return {"route": None}
+    return {"route": request.endpoint, "method": request.method, "path": request.full_path.rstrip('?')}
+
+
+def _explainable(statement):
+    return statement.lstrip().upper().startswith(('SELECT', 'WITH'))
+
+
+class SlowQueryRecorder:
+    def __init__(self):
+        self.threshold = None
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._engines = {}
+
+    def configure(self, config):
+        self.threshold = config['SLOW_QUERY_MS'] / 1000.0 if config['SLOW_QUERY_MS'] else None
+        self.sample_rate = config['SLOW_QUERY_SAMPLE_RATE']
+        self.limiter = RateLimiter(config['SLOW_QUERY_MAX_PER_MINUTE'])
+        self.explain = config['SLOW_QUERY_EXPLAIN']
+        if self.explain not in EXPLAIN_MODES:
+            raise ValueError(f'SLOW_QUERY_EXPLAIN must be one of {", ".join(EXPLAIN_MODES)}')
+        self.explain_limiter = RateLimiter(config['SLOW_QUERY_EXPLAIN_PER_MINUTE'])
+
+    # Request side.
+
+    def before(self, conn, cursor, statement, parameters, context, executemany):
+        if self.threshold is not None:
+            conn.info['slow_query_started'] = time.perf_counter()
+
+    def after(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('slow_query_started', None)
+        if started is None:
+            return
+        duration = time.perf_counter() - started
+        if duration < self.threshold or random.random() >= self.sample_rate or not self.limiter.allow():
+            return
+        record = {
+            "at": datetime.utcnow().isoformat() + 'Z',
+            "duration_ms": round(duration * 1000, 2),
+            "statement": statement,
+            "parameters": _parameters(parameters, executemany),
+            **_origin(),
+            "database": repr(conn.engine.url),
+        }
+        explain = (
+            self.explain != 'off' and not executemany and _explainable(statement)
+            and conn.engine.url.database not in (None, '', ':memory:') and self.explain_limiter.allow()
+        )
+        job = (record, conn.engine.url, statement, parameters) if explain else (record, None, None, None)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            return
+        self._start()
+
+    # Background side.
+
+    def _start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='slow-queries', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            record, url, statement, parameters = self._queue.get()
+            if url is not None:
+                try:
+                    record['plan'] = self.plan(url, statement, parameters)
+                except Exception as error:
+                    record['plan_error'] = str(error)
+            logger.info(json.dumps(record, default=str))
+
+    def _engine(self, url):
+        # A sync driver and no pool, so plans never take the app's connections.
+        key = url.set(drivername=url.get_backend_name())
+        engine = self._engines.get(key)
+        if engine is None:
+            engine = self._engines[key] = create_engine(key, poolclass=NullPool)
+        return engine
+
+    def plan(self, url, statement, parameters):
+        with self._engine(url).connect() as connection:
+            if connection.dialect.name == 'sqlite':
+                rows = connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                return [row[-1] for row in rows]
+            options = 'ANALYZE, BUFFERS, FORMAT JSON' if self.explain == 'analyze' else 'FORMAT JSON'
+            with connection.begin() as transaction:
+                plan = connection.exec_driver_sql(f'EXPLAIN ({options}) {statement}', parameters).scalar()
+                transaction.rollback()
+            return json.loads(plan) if isinstance(plan, str) else plan
+
+
+recorder = SlowQueryRecorder()
+
+
+def init_app(app):
+    app.config.setdefault('SLOW_QUERY_MS', 0)
+    app.config.setdefault('SLOW_QUERY_LOG', 'slow_queries.log')
+    app.config.setdefault('SLOW_QUERY_SAMPLE_RATE', 1.0)
+    app.config.setdefault('SLOW_QUERY_MAX_PER_MINUTE', 60)
+    app.config.setdefault('SLOW_QUERY_EXPLAIN', 'off')
+    app.config.setdefault('SLOW_QUERY_EXPLAIN_PER_MINUTE', 6)
+    recorder.configure(app.config)
+    if recorder.threshold is None:
+        return
+
+    if not logger.handlers:
+        # One log per process, however many apps create_app() builds.
+        handler = FileHandler(app.config['SLOW_QUERY_LOG'])
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    event.listen(Engine, 'before_cursor_execute', recorder.before)
+    event.listen(Engine, 'after_cursor_execute', recorder.after)
@@ -0,0 +1,34 @@
+from flask import Response, current_app, request, stream_with_context
+
+#----------------------------------------------------------------------------#
+# Streaming responses.
+#
+# A streamed listing page hands Jinja a generator of rows instead of a
+# list; the template is rendered with Template.stream() and sent a few
+# buffered chunks at a time, so the first bytes leave as soon as the first
+# batch of rows is read and memory holds one batch, not the whole listing.
+#----------------------------------------------------------------------------#
+
+def wants_stream():
+    """Whether this listing request should be streamed in full.
+
+    `?stream=1` / `?stream=0` override the STREAM_LISTINGS default. A page
+    token always means a regular paged response.
+    """
+    if request.args.get('page'):
+        return False
+    flag = request.args.get('stream')
+    if flag is None:
+        return current_app.config['STREAM_LISTINGS']
+    return flag.lower() not in ('', '0', 'false', 'no')
+
+
+def stream_page(template_name, **context):
+    """Like render_template(), but streams the output as it is rendered."""
+    app = current_app._get_current_object()
+    app.update_template_context(context)
+    template = app.jinja_env.get_template(template_name)
+
+    stream = template.stream(context)
+    stream.enable_buffering(app.config['STREAM_BUFFER_SIZE'])
+    return Response(stream_with_context(stream), mimetype='text/html')
@@ -0,0 +1,93 @@
+import os
+import tempfile
+
+import pytest
+
+from explain import ROUTES, check_routes, explain, record_route
+
+#----------------------------------------------------------------------------#
+# Query plans of the read routes (explain.py).
+#
+# Every SELECT a read route sends must go through an index. The catalog is
+# a scratch SQLite database, or the Postgres database named by
+# TEST_POSTGRES_URL -- a scratch one: its tables are dropped and recreated.
+# The index-specific checks run on Postgres only.
+#----------------------------------------------------------------------------#
+
+# (venues, artists, shows), enough that a full scan is not the cheaper plan.
+SIZE = (200, 400, 4000)
+
+
+@pytest.fixture(scope='module')
+def app():
+    import config
+    from app import create_app
+    from benchmarks.datagen import generate
+    from cache import cache
+    from db import db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = os.environ.get('TEST_POSTGRES_URL') or f'sqlite:///{tmp}/plans.db'
+        app = create_app({
+            "SQLALCHEMY_DATABASE_URI": url,
+            "SQLALCHEMY_BINDS": {},
+            "SQLALCHEMY_ENGINE_OPTIONS": config.engine_options(url),
+            "ADMIN_TOKEN": 'test',
+        })
+        # Plans of the queries, not of cache hits.
+        cache.enabled = False
+        with app.app_context():
+            db.drop_all()
+            db.create_all()
+            generate(*SIZE)
+            db.session.remove()
+            yield app
+            db.session.remove()
+            db.drop_all()
+
+
+@pytest.fixture
+def postgres(app):
+    from db import db
+
+    if db.engine.dialect.name != 'postgresql':
+        pytest.skip('set TEST_POSTGRES_URL to check the Postgres indexes')
+
+
+def _path(route):
+    return route.format(venue_id=1, artist_id=1)
+
+
+def _plan(app, path):
+    """Every plan line of the SELECTs one GET sends."""
+    from db import db
+
+    status, statements = record_route(app.test_client(), path)
+    assert status == 200
+    lines = []
+    for engine, statement, parameters in statements:
+        details, _ = explain(engine, statement, parameters)
+        lines.extend(details)
+    db.session.remove()
+    return lines
+
+
+@pytest.mark.parametrize('route', ROUTES)
+def test_route_reads_through_indexes(app, route):
+    output = []
+    failures = check_routes([_path(route)], echo=output.append)
+    assert not failures, '\n'.join(output)
+    assert ' -> 200,' in output[0]
+
+
+@pytest.mark.parametrize('path, index', [
+    ('/venues/search?search_term=music', 'ix_venue_search_trgm'),
+    ('/artists/search?search_term=guns', 'ix_artist_search_trgm'),
+    ('/shows', 'ix_show_start_time'),
+    ('/venues/1', 'ix_show_venue_start'),
+    ('/artists/1', 'ix_show_artist_start'),
+    ('/venues', 'ix_area_directory_area'),
+])
+def test_route_uses_index(app, postgres, path, index):
+    lines = _plan(app, path)
+    assert any(index in line for line in lines), '\n'.join(lines)
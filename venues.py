@@ -0,0 +1,161 @@
+from flask import Blueprint, current_app, render_template, request, flash, redirect, url_for, abort
+
+from db import db
+from models import Venue
+from loaders import venue_directory, venue_detail, stream_venue_directory, venue_last_modified, venue_last_modified_async
+from streaming import wants_stream, stream_page
+from cache import cache
+from routing import use_replica
+from windows import requested_window, window_args
+from conditional import conditional
+from search import venue_search_page, venue_search_facets
+from genres import requested_genres, genre_args, listing_facets
+
+bp = Blueprint('venues', __name__)
+
+#  Venues
+#  ----------------------------------------------------------------
+
+@bp.route('/venues')
+@cache.cached('venues', 'areas')
+@use_replica
+def venues():
+  genres, match = requested_genres()
+  filters = dict(
+    facets=listing_facets(Venue, genres, match),
+    genres=genres, match=match, genre_args=genre_args(genres, match),
+  )
+  if wants_stream():
+    areas = stream_venue_directory(current_app.config['STREAM_BATCH_SIZE'], genres, match)
+    return stream_page('pages/venues.html', areas=areas, page=None, **filters)
+
+  page = venue_directory(request.args.get('page'), current_app.config['PAGE_SIZE'], genres, match)
+  return render_template('pages/venues.html', areas=page.items, page=page, **filters)
+
+@bp.route('/venues/search', methods=['GET', 'POST'])
+@cache.cached('venues', 'shows')
+@use_replica
+def search_venues():
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+
+  # GET carries the search term on the next/previous page links.
+  search_term=request.values.get('search_term', '')
+  genres, match = requested_genres()
+  page=venue_search_page(search_term, request.args.get('page'), current_app.config['PAGE_SIZE'], genres, match)
+  facets=venue_search_facets(search_term, genres, match)
+
+  return render_template('pages/search_venues.html', results=page.items, search_term=search_term, page=page,
+    facets=facets, genres=genres, match=match, genre_args=genre_args(genres, match))
+
+@bp.route('/venues/<int:venue_id>')
+@use_replica
+@conditional(venue_last_modified, venue_last_modified_async)
+@cache.cached('venues', 'artists', 'shows')
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  start, end = requested_window()
+  data = venue_detail(venue_id, start=start, end=end)
+  if data is None:
+    abort(404)
+
+  return render_template('pages/show_venue.html', venue=data, start=start, end=end, window_args=window_args(start, end))
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@bp.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  try:
+    thisVenue = Venue(name=request.form.get('name'),
+        city=request.form.get('city'),
+        state=request.form.get('state'),
+        address=request.form.get('address'),
+        phone=request.form.get('phone'),
+        image_link=request.form.get('image_link'),
+        facebook_link=request.form.get('facebook_link'),
+        genres=request.form.getlist('genres'),
+        website_link=request.form.get('website_link'),
+        seeking_talent=request.form.get('seeking_talent', default=False, type=bool),
+        seeking_description=request.form.get('seeking_description'),
+        shows=request.form.getlist('shows')
+    )
+    db.session.add(thisVenue)
+    db.session.commit()
+    cache.bump('venues')
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Venue ' + request.form['name'] + ' could not be listed.')
+  finally:
+    db.session.close()
+
+  return render_template('pages/home.html')
+
+@bp.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  try:
+    Venue.query.filter_by(id=venue_id).delete()
+    db.session.commit()
+    cache.bump('venues', 'shows')
+  except:
+    db.session.rollback()
+    flash('Venue could not be deleted!')
+  finally:
+    db.session.close()
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  return None
+
+#  Update
+#  ----------------------------------------------------------------
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+
+  venue = Venue.query.get_or_404(venue_id)
+  form = VenueForm(obj=venue)
+  return render_template('forms/edit_venue.html', form=form, venue=venue)
+
+@bp.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  from forms import VenueForm
+
+  venue = Venue.query.get_or_404(venue_id)
+  form = VenueForm(request.form, meta={"csrf": False})
+
+  if form.validate():
+    try:
+
+      venue.name = form.name.data
+      venue.city = form.city.data
+      venue.state = form.state.data
+      venue.address = form.address.data
+      venue.phone = form.phone.data
+      venue.image_link = form.image_link.data
+      venue.genres = form.genres.data
+      venue.facebook_link = form.facebook_link.data
+      venue.website_link = form.website_link.data
+      venue.seeking_description = form.seeking_description.data
+      venue.seeking_talent = bool(form.seeking_talent.data)
+
+      db.session.commit()
+      cache.bump('venues')
+      flash('Venue ' + venue.name + ' was successfully edited!')
+    except:
+      db.session.rollback()
+      flash('Venue ' + venue.name + ' could not be edited!')
+    finally:
+      db.session.close()
+  else:
+    flash('Errors in validation')
+
+  return redirect(url_for('.show_venue', venue_id=venue_id))
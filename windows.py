@@ -0,0 +1,88 @@
+from datetime import date, datetime, time, timedelta
+
+from flask import abort, request
+
+#----------------------------------------------------------------------------#
+# Time windows.
+#
+# ?from=2026-10-23&to=2026-10-26 narrows /shows and the venue and artist
+# pages to shows starting at or after `from` and before `to` -- "this
+# weekend" is from Friday to Monday. Both are ISO 8601 dates or datetimes
+# (with an offset, they are converted to local time) and either may be
+# left out; `to` is exclusive, as in the exports.
+#
+# Windows are range conditions on Show.start_time: a range scan of
+# ix_show_start_time on /shows (which is paged on start_time anyway) and of
+# ix_show_venue_start / ix_show_artist_start on the detail pages.
+#
+# ?month=2026-10 picks the month of /shows/calendar.
+#----------------------------------------------------------------------------#
+
+
+def _parse(value, name):
+    if not value:
+        return None
+    try:
+        value = datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, description=f'{name} must be an ISO 8601 date or datetime')
+    if value.tzinfo is not None:
+        # Show times are naive local times.
+        value = value.astimezone().replace(tzinfo=None)
+    return value
+
+
+def requested_window():
+    """(start, end) from the request's `from` and `to` parameters; None where absent."""
+    start = _parse(request.args.get('from'), 'from')
+    end = _parse(request.args.get('to'), 'to')
+    if start is not None and end is not None and end <= start:
+        abort(400, description='to must be after from')
+    return start, end
+
+
+def _format(value):
+    return value.date().isoformat() if value.time() == time() else value.isoformat(timespec='minutes')
+
+
+def window_args(start, end):
+    """URL parameters that carry a window onto other links."""
+    args = {}
+    if start is not None:
+        args['from'] = _format(start)
+    if end is not None:
+        args['to'] = _format(end)
+    return args
+
+
+def window_filter(column, start, end):
+    """Criteria keeping `column` in [start, end)."""
+    criteria = []
+    if start is not None:
+        criteria.append(column >= start)
+    if end is not None:
+        criteria.append(column < end)
+    return criteria
+
+
+def day_window(day):
+    """window_args() for the one day `day`."""
+    start = datetime.combine(day, time())
+    return window_args(start, start + timedelta(days=1))
+
+
+def requested_month():
+    """The first day of the month in the request's `month` (YYYY-MM), this month by default."""
+    value = request.args.get('month')
+    if not value:
+        return date.today().replace(day=1)
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        abort(400, description='month must be YYYY-MM')
+
+
+def month_bounds(first):
+    """(first day of the month, first day of the next) of the month starting on `first`."""
+    following = (first + timedelta(days=31)).replace(day=1)
+    return first, following
@@ -0,0 +1,9 @@
+from app import create_app
+
+# The app instance servers import:
+#
+#   gunicorn --preload --workers 4 wsgi:app
+#
+# With --preload the app is built once in the master and forked into the
+# workers, which share the imported modules and compiled templates.
+app = create_app()